@@ -1,6 +1,7 @@
 
 from django.contrib import admin
 from .models import AlloyComposition, ProcessData, Inventory, Alert
+from . import timeseries
 
 @admin.register(AlloyComposition)
 class AlloyCompositionAdmin(admin.ModelAdmin):
@@ -8,12 +9,16 @@ class AlloyCompositionAdmin(admin.ModelAdmin):
     list_filter = ['grade', 'created_at']
     search_fields = ['name', 'grade']
 
-@admin.register(ProcessData)
 class ProcessDataAdmin(admin.ModelAdmin):
     list_display = ['furnace_id', 'temperature', 'pressure', 'timestamp']
     list_filter = ['furnace_id', 'timestamp']
     ordering = ['-timestamp']
 
+# Bucketed readings are not rows of process_data, so the ORM admin would show
+# (and edit) a stale table; use the API in that mode
+if not timeseries.bucketed_storage():
+    admin.site.register(ProcessData, ProcessDataAdmin)
+
 @admin.register(Inventory)
 class InventoryAdmin(admin.ModelAdmin):
     list_display = ['material_name', 'material_type', 'quantity', 'unit', 'supplier']
@@ -29,5 +34,7 @@ class AlertAdmin(admin.ModelAdmin):
 
     def mark_resolved(self, request, queryset):
         from django.utils import timezone
-        queryset.update(is_resolved=True, resolved_at=timezone.now())
+        # update() bypasses auto_now; set updated_at so the changes feed and ETags see it
+        now = timezone.now()
+        queryset.update(is_resolved=True, resolved_at=now, updated_at=now)
     mark_resolved.short_description = "Mark selected alerts as resolved"
@@ -1,14 +1,21 @@
 
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from datetime import timedelta
-from .models import ProcessData, AlloyComposition, Inventory, Alert
+from .models import AlloyComposition, Inventory, Alert
 from .utils import AlloyOptimizer, QualityAnalyzer, ProcessMonitor
+from .db_routers import use_analytics_db
+from .timeseries import fetch_readings
+from .drift import detect_drift
+from .throttling import AnalyticsThrottle
+from .simulation import (WhatIfSimulator, target_midpoints, DEFAULT_HEAT_MASS_KG,
+                         DEFAULT_MEASUREMENT_STD, DEFAULT_TRIALS)
 import json
 
 @api_view(['POST'])
+@throttle_classes([AnalyticsThrottle])
 def generate_recommendations(request):
     """Generate AI-powered alloy recommendations"""
     try:
@@ -57,6 +64,8 @@ def generate_recommendations(request):
         )
 
 @api_view(['GET'])
+@throttle_classes([AnalyticsThrottle])
+@use_analytics_db
 def quality_analysis(request):
     """Perform quality analysis on recent process data"""
     try:
@@ -64,12 +73,7 @@ def quality_analysis(request):
         furnace_id = request.GET.get('furnace_id')
         
         cutoff_time = timezone.now() - timedelta(hours=hours)
-        query = ProcessData.objects.filter(timestamp__gte=cutoff_time)
-        
-        if furnace_id:
-            query = query.filter(furnace_id=furnace_id)
-        
-        recent_data = list(query.order_by('-timestamp'))
+        recent_data = list(fetch_readings(since=cutoff_time, furnace_id=furnace_id, newest_first=True))
         
         if not recent_data:
             return Response({'error': 'No recent data found'}, status=status.HTTP_404_NOT_FOUND)
@@ -101,13 +105,43 @@ def quality_analysis(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@throttle_classes([AnalyticsThrottle])
+@use_analytics_db
+def composition_drift(request):
+    """Multivariate composition drift for every furnace"""
+    try:
+        target_grade = request.GET.get('target_grade', '316L')
+        minutes = int(request.GET.get('minutes', 60))
+        window = int(request.GET.get('window', 5))
+        
+        detector, results = detect_drift(target_grade, minutes, window)
+        
+        return Response({
+            'target_grade': target_grade,
+            'threshold': round(detector.threshold, 3),
+            'furnaces_scored': len(results),
+            'drifting': sum(1 for r in results if r['drifting']),
+            'furnaces': sorted(results, key=lambda r: r['t2'], reverse=True)
+        })
+        
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'error': f'Error detecting composition drift: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['POST'])
+@throttle_classes([AnalyticsThrottle])
 def optimize_process(request):
     """Optimize process parameters based on target specifications"""
     try:
         data = request.data
         target_grade = data.get('target_grade', '316L')
         current_params = data.get('current_parameters', {})
+        current_composition = data.get('current_composition', {})
         
         # Optimization logic
         optimized_params = {
@@ -116,9 +150,27 @@ def optimize_process(request):
             'oxygen_level': 0.02,
             'recommended_additions': []
         }
+        simulation = None
         
         # Add recommendations based on grade
-        if target_grade == '316L':
+        if current_composition and target_grade in QualityAnalyzer.GRADE_SPECS:
+            heat_mass_kg = float(data.get('heat_mass_kg', DEFAULT_HEAT_MASS_KG))
+            recommendations = AlloyOptimizer.calculate_alloy_recommendations(
+                target_midpoints(target_grade), current_composition
+            )
+            for rec in recommendations:
+                optimized_params['recommended_additions'].append({
+                    'material': rec['material'],
+                    # Recommendations are sized per 100 kg of melt
+                    'quantity': round(rec['quantity'] * heat_mass_kg / 100, 2),
+                    'reason': f"{rec['element']} adjustment from {rec['current']:.3f}% to {rec['target']:.3f}%"
+                })
+            simulation = WhatIfSimulator(target_grade, heat_mass_kg).run(
+                current_composition,
+                optimized_params['recommended_additions'],
+                measurement_std=data.get('measurement_std', DEFAULT_MEASUREMENT_STD)
+            )
+        elif target_grade == '316L':
             optimized_params['recommended_additions'] = [
                 {'material': 'FeCr 65%', 'quantity': 15.2, 'reason': 'Chromium adjustment'},
                 {'material': 'Ni Metal', 'quantity': 8.7, 'reason': 'Nickel content optimization'}
@@ -126,6 +178,7 @@ def optimize_process(request):
         
         return Response({
             'optimized_parameters': optimized_params,
+            'simulation': simulation,
             'target_grade': target_grade,
             'optimization_confidence': 92.5,
             'estimated_improvement': {
@@ -141,7 +194,44 @@ def optimize_process(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+@throttle_classes([AnalyticsThrottle])
+def what_if(request):
+    """Monte Carlo what-if for candidate alloy additions"""
+    try:
+        data = request.data
+        current_composition = data.get('current_composition', {})
+        
+        if not current_composition:
+            return Response(
+                {'error': 'current_composition is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        simulator = WhatIfSimulator(
+            data.get('target_grade', '316L'),
+            heat_mass_kg=float(data.get('heat_mass_kg', DEFAULT_HEAT_MASS_KG)),
+            trials=int(data.get('trials', DEFAULT_TRIALS)),
+            seed=data.get('seed')
+        )
+        result = simulator.run(
+            current_composition,
+            data.get('additions', []),
+            measurement_std=data.get('measurement_std', DEFAULT_MEASUREMENT_STD),
+            off_spec_cost=float(data.get('off_spec_cost', 0))
+        )
+        return Response(result)
+        
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return Response({'error': f'Invalid what-if request: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'error': f'Error running what-if simulation: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['GET'])
+@throttle_classes([AnalyticsThrottle])
 def predictive_maintenance(request):
     """Provide predictive maintenance insights"""
     try:
@@ -188,13 +278,15 @@ def predictive_maintenance(request):
         )
 
 @api_view(['GET'])
+@throttle_classes([AnalyticsThrottle])
+@use_analytics_db
 def dashboard_metrics(request):
     """Get comprehensive dashboard metrics"""
     try:
         # Recent process data
-        recent_data = ProcessData.objects.filter(
-            timestamp__gte=timezone.now() - timedelta(hours=24)
-        ).order_by('-timestamp')[:10]
+        recent_data = fetch_readings(
+            since=timezone.now() - timedelta(hours=24), newest_first=True, limit=10
+        )
         
         # Active alerts
         active_alerts = Alert.objects.filter(is_resolved=False).count()
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class AlloyApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'alloy_api'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.models.signals import post_delete
+        from .models import AlloyComposition, Inventory, Alert
+        from .sync import record_tombstone
+
+        for model in (AlloyComposition, Inventory, Alert):
+            post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'tombstone_{model.__name__}')
+
+        if settings.WARM_HEAVY_IMPORTS:
+            from .lazy import warm_up
+            warm_up()
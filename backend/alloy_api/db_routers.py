@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+
+DEFAULT_DB_ALIAS = 'default'
+
+_analytics_reads = ContextVar('analytics_reads', default=False)
+
+def analytics_db_alias():
+    """Return the configured analytics alias, falling back to default"""
+    alias = getattr(settings, 'ANALYTICS_DB_ALIAS', 'analytics')
+    return alias if alias in settings.DATABASES else DEFAULT_DB_ALIAS
+
+@contextmanager
+def analytics_reads():
+    """Route ORM reads made inside this block to the analytics database"""
+    token = _analytics_reads.set(True)
+    try:
+        yield analytics_db_alias()
+    finally:
+        _analytics_reads.reset(token)
+
+def use_analytics_db(view_func):
+    """Opt a view into reading through the analytics database.
+
+    Apply it below ``@api_view`` so queries evaluated while the view builds
+    its response are routed, e.g.::
+
+        @api_view(['GET'])
+        @use_analytics_db
+        def quality_analysis(request): ...
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with analytics_reads():
+            return view_func(*args, **kwargs)
+    return wrapper
+
+class AnalyticsRouter:
+    """Send opted-in reads to the analytics alias; writes always go to default"""
+
+    def db_for_read(self, model, **hints):
+        if _analytics_reads.get():
+            return analytics_db_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same collections, so relations are always valid
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,187 @@
+import math
+import threading
+import time
+from datetime import timedelta
+from statistics import NormalDist
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.utils import timezone
+from .lazy import lazy_import
+from .timeseries import latest_readings
+from .utils import QualityAnalyzer
+
+np = lazy_import('numpy')
+
+DEFAULT_ALPHA = 0.01
+DEFAULT_WINDOW = 5
+
+def chi2_quantile(q: float, dof: int) -> float:
+    """Chi-square quantile via the Wilson-Hilferty approximation"""
+    z = NormalDist().inv_cdf(q)
+    h = 2 / (9 * dof)
+    return dof * (1 - h + z * math.sqrt(h)) ** 3
+
+class CompositionDriftDetector:
+    """Hotelling T² drift detection on composition_data against a grade reference.
+
+    T² of the mean of n readings is n * dᵀ Σ⁻¹ d for deviation d from the
+    reference mean. Each element's share is d_j (Σ⁻¹ d)_j * n, which sums to
+    T², so the largest shares name the elements driving the drift. All
+    furnaces are scored in one batch.
+    """
+
+    def __init__(self, target_grade: str, elements: List[str], mean, covariance,
+                 alpha: float = DEFAULT_ALPHA):
+        self.target_grade = target_grade
+        self.elements = list(elements)
+        self.mean = np.asarray(mean, dtype=float)
+        self.inv_cov = np.linalg.pinv(np.asarray(covariance, dtype=float))
+        self.threshold = chi2_quantile(1 - alpha, len(self.elements))
+
+    @classmethod
+    def from_history(cls, target_grade: str, compositions: List[Dict[str, float]],
+                     alpha: float = DEFAULT_ALPHA, shrinkage: float = 0.1):
+        """Reference fitted on the in-spec compositions of past heats.
+
+        The covariance is shrunk towards its diagonal so a short history still
+        inverts cleanly. Raises ValueError without enough in-spec samples.
+        """
+        if target_grade not in QualityAnalyzer.GRADE_SPECS:
+            raise ValueError(f'Unknown grade: {target_grade}')
+        compositions = [c for c in compositions if c]
+        # Model the spec elements the plant routinely measures
+        elements = sorted(
+            e for e in QualityAnalyzer.GRADE_SPECS[target_grade]
+            if 2 * sum(e in c for c in compositions) >= len(compositions) > 0
+        )
+        rows = [[float(c[e]) for e in elements] for c in compositions if all(e in c for e in elements)]
+        samples = np.array(rows, dtype=float).reshape(len(rows), len(elements))
+        if elements:
+            _, in_spec = QualityAnalyzer.calculate_quality_scores(samples, elements, target_grade)
+            samples = samples[in_spec]
+        if not elements or len(samples) <= 2 * len(elements):
+            raise ValueError(
+                f'Not enough in-spec history to fit the {target_grade} reference '
+                f'({len(samples)} readings, need more than {2 * len(elements)})'
+            )
+
+        covariance = np.cov(samples, rowvar=False)
+        covariance = (1 - shrinkage) * covariance + shrinkage * np.diag(np.diag(covariance))
+        covariance += np.eye(len(elements)) * 1e-9
+        return cls(target_grade, elements, samples.mean(axis=0), covariance, alpha)
+
+    def to_matrix(self, compositions: List[Dict[str, float]]):
+        """(n, elements) array; elements missing from a reading take the reference mean"""
+        matrix = np.tile(self.mean, (len(compositions), 1))
+        for row, composition in enumerate(compositions):
+            for col, element in enumerate(self.elements):
+                value = (composition or {}).get(element)
+                if value is not None:
+                    matrix[row, col] = value
+        return matrix
+
+    def score(self, furnace_ids: List[str], compositions, counts=None, top: int = 3) -> List[Dict]:
+        """Score one (window-mean) composition per furnace"""
+        compositions = np.asarray(compositions, dtype=float)
+        counts = np.ones(len(furnace_ids)) if counts is None else np.asarray(counts, dtype=float)
+
+        deviation = compositions - self.mean
+        contributions = deviation * (deviation @ self.inv_cov) * counts[:, None]
+        t2 = contributions.sum(axis=1)
+        leaders = np.argsort(-contributions, axis=1)[:, :top]
+
+        results = []
+        for i, furnace_id in enumerate(furnace_ids):
+            results.append({
+                'furnace_id': furnace_id,
+                't2': round(float(t2[i]), 3),
+                'threshold': round(self.threshold, 3),
+                'drifting': bool(t2[i] > self.threshold),
+                'severity': self._severity(t2[i]),
+                'samples': int(counts[i]),
+                'top_contributors': [
+                    {
+                        'element': self.elements[j],
+                        'contribution': round(float(contributions[i, j]), 3),
+                        'value': round(float(compositions[i, j]), 4),
+                        'reference': round(float(self.mean[j]), 4),
+                    }
+                    for j in leaders[i]
+                ],
+            })
+        return results
+
+    def score_readings(self, readings, window: int = DEFAULT_WINDOW, top: int = 3) -> List[Dict]:
+        """Score the mean of each furnace's latest `window` readings.
+
+        Each furnace's readings must come newest first (see latest_readings).
+        """
+        furnace_index = {}
+        taken = []
+        rows, owners = [], []
+        for reading in readings:
+            if not reading.composition_data:
+                continue
+            index = furnace_index.setdefault(reading.furnace_id, len(furnace_index))
+            if index == len(taken):
+                taken.append(0)
+            if taken[index] >= window:
+                continue
+            taken[index] += 1
+            rows.append(reading.composition_data)
+            owners.append(index)
+        if not rows:
+            return []
+
+        owners = np.asarray(owners)
+        sums = np.zeros((len(furnace_index), len(self.elements)))
+        np.add.at(sums, owners, self.to_matrix(rows))
+        counts = np.bincount(owners, minlength=len(furnace_index))
+        return self.score(list(furnace_index), sums / counts[:, None], counts, top)
+
+    def _severity(self, t2: float) -> Optional[str]:
+        if t2 <= self.threshold:
+            return None
+        if t2 > 4 * self.threshold:
+            return 'critical'
+        return 'high' if t2 > 2 * self.threshold else 'medium'
+
+_references = {}
+_references_lock = threading.Lock()
+
+def get_reference(target_grade: str, minutes: int) -> CompositionDriftDetector:
+    """Detector fitted on history before the last `minutes`, refitted every DRIFT_REFERENCE_TTL_MINUTES.
+
+    Fitting reads up to DRIFT_REFERENCE_PER_FURNACE readings per furnace, so
+    it is cached per grade and window in this process rather than redone on
+    every check.
+    """
+    key = (target_grade, minutes)
+    with _references_lock:
+        cached = _references.get(key)
+    if cached and time.monotonic() - cached[0] < settings.DRIFT_REFERENCE_TTL_MINUTES * 60:
+        return cached[1]
+
+    until = timezone.now() - timedelta(minutes=minutes)
+    history = latest_readings(
+        settings.DRIFT_REFERENCE_PER_FURNACE,
+        since=until - timedelta(hours=settings.DRIFT_REFERENCE_HOURS),
+        until=until,
+    )
+    detector = CompositionDriftDetector.from_history(
+        target_grade, [r.composition_data for r in history]
+    )
+    with _references_lock:
+        _references[key] = (time.monotonic(), detector)
+    return detector
+
+def detect_drift(target_grade: str, minutes: int, window: int = DEFAULT_WINDOW):
+    """Score each furnace's latest `window` readings from the last `minutes`.
+
+    Returns (detector, results). Per call only those readings are fetched;
+    the reference comes from get_reference.
+    """
+    detector = get_reference(target_grade, minutes)
+    since = timezone.now() - timedelta(minutes=minutes)
+    results = detector.score_readings(latest_readings(window, since=since), window=window)
+    return detector, results
@@ -0,0 +1,182 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from . import timeseries
+from .models import ProcessData
+
+logger = logging.getLogger(__name__)
+
+def write_readings(readings: List[Dict]):
+    """Persist a batch of validated readings with the active storage layout"""
+    close_old_connections()
+    if timeseries.bucketed_storage():
+        timeseries.append_readings(readings)
+    else:
+        ProcessData.objects.bulk_create([ProcessData(**reading) for reading in readings])
+
+class WriteBehindBuffer:
+    """Bounded in-memory queue of readings flushed to Mongo in batches.
+
+    A daemon thread writes up to `flush_rows` readings at a time, as soon as
+    that many are queued or every `flush_interval_ms`, whichever comes first.
+    `offer` returns False instead of blocking when the buffer is full.
+    A batch that fails to write is retried, with a growing pause, up to
+    `max_retries` times before it is counted as dead-lettered and dropped.
+    """
+
+    def __init__(self, capacity: int, flush_rows: int, flush_interval_ms: int,
+                 max_retries: int = 3, writer=write_readings):
+        self.capacity = capacity
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_retries = max_retries
+        self.writer = writer
+        self.pid = os.getpid()
+        self._rows = deque()
+        self._failed = []  # batch waiting to be retried
+        self._attempts = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._stats = {
+            'accepted': 0,
+            'rejected': 0,
+            'flushes': 0,
+            'flushed_rows': 0,
+            'failed_flushes': 0,
+            'dead_letter_rows': 0,
+            'last_flush_ms': None,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'last_flush_at': None,
+        }
+
+    def offer(self, reading: Dict) -> bool:
+        """Queue a reading; False means the buffer is full and the caller should back off"""
+        with self._cond:
+            # A batch awaiting retry still counts, so a Mongo outage turns into 429s
+            if self._stopping or len(self._rows) + len(self._failed) >= self.capacity:
+                self._stats['rejected'] += 1
+                return False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+                self._thread.start()
+            reading.setdefault('timestamp', timezone.now())
+            self._rows.append(reading)
+            self._stats['accepted'] += 1
+            if len(self._rows) >= self.flush_rows:
+                self._cond.notify()
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the flusher"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is None:
+            return
+        thread.join(timeout)
+        if thread.is_alive():
+            # Still retrying (e.g. Mongo is down); whatever is queued dies with the process
+            with self._cond:
+                lost = len(self._rows) + len(self._failed)
+                self._rows.clear()
+                self._failed = []
+                self._stats['dead_letter_rows'] += lost
+            if lost:
+                logger.error(f'Dropping {lost} buffered readings not flushed within {timeout}s of shutdown')
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            stats = dict(self._stats)
+            depth = len(self._rows) + len(self._failed)
+        total_ms = stats.pop('total_flush_ms')
+        return {
+            # Each worker process has its own buffer; these figures are for this one
+            'pid': self.pid,
+            'depth': depth,
+            'capacity': self.capacity,
+            'flush_rows': self.flush_rows,
+            'flush_interval_ms': self.flush_interval * 1000,
+            'avg_flush_ms': round(total_ms / stats['flushes'], 2) if stats['flushes'] else None,
+            **stats,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._failed:
+                    batch, backoff = self._failed, self.flush_interval * self._attempts
+                else:
+                    self._cond.wait_for(
+                        lambda: self._stopping or len(self._rows) >= self.flush_rows,
+                        timeout=self.flush_interval
+                    )
+                    batch = [self._rows.popleft() for _ in range(min(len(self._rows), self.flush_rows))]
+                    backoff = 0
+            if backoff:
+                time.sleep(backoff)
+            if batch:
+                self._flush(batch)
+            with self._cond:
+                if self._stopping and not self._rows and not self._failed:
+                    return
+
+    def _flush(self, batch: List[Dict]):
+        started = time.perf_counter()
+        try:
+            self.writer(batch)
+            written = True
+        except Exception as e:
+            logger.error(f'Failed to flush {len(batch)} buffered readings '
+                         f'(attempt {self._attempts + 1}): {str(e)}')
+            written = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._cond:
+            if written:
+                self._failed, self._attempts = [], 0
+                self._stats['flushed_rows'] += len(batch)
+            elif self._attempts < self.max_retries:
+                # A retry may write part of the batch twice; readings are at-least-once
+                self._failed, self._attempts = batch, self._attempts + 1
+                self._stats['failed_flushes'] += 1
+            else:
+                logger.error(f'Dropping {len(batch)} buffered readings after {self._attempts + 1} attempts')
+                self._failed, self._attempts = [], 0
+                self._stats['failed_flushes'] += 1
+                self._stats['dead_letter_rows'] += len(batch)
+            self._stats['flushes'] += 1
+            self._stats['last_flush_ms'] = round(elapsed_ms, 2)
+            self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], elapsed_ms), 2)
+            self._stats['total_flush_ms'] += elapsed_ms
+            self._stats['last_flush_at'] = timezone.now()
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def buffered_ingest() -> bool:
+    """True when single readings are accepted into the write-behind buffer"""
+    return getattr(settings, 'PROCESS_DATA_INGEST_MODE', 'sync') == 'buffered'
+
+def get_buffer() -> WriteBehindBuffer:
+    """This process's buffer; a forked worker gets its own"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None or _buffer.pid != os.getpid():
+            _buffer = WriteBehindBuffer(
+                capacity=settings.INGEST_BUFFER_CAPACITY,
+                flush_rows=settings.INGEST_FLUSH_ROWS,
+                flush_interval_ms=settings.INGEST_FLUSH_INTERVAL_MS,
+                max_retries=settings.INGEST_FLUSH_RETRIES,
+            )
+            atexit.register(_buffer.stop)
+        return _buffer
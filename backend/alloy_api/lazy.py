@@ -0,0 +1,48 @@
+import importlib
+
+# Heavy analytics dependencies the app loads through lazy_import, imported on
+# first use so CRUD-only workers never pay for them
+HEAVY_MODULES = ['numpy']
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+_lazy_modules = {}
+
+def lazy_import(name):
+    """Return a shared LazyModule for `name`, e.g. ``np = lazy_import('numpy')``"""
+    if name not in _lazy_modules:
+        _lazy_modules[name] = LazyModule(name)
+    return _lazy_modules[name]
+
+def warm_up(modules=None):
+    """Import heavy dependencies now instead of on the first analytics request.
+
+    By default that is HEAVY_MODULES plus anything registered with
+    lazy_import so far. Returns the modules that were imported. Missing
+    optional packages are skipped.
+    """
+    loaded = []
+    for name in modules or sorted(set(HEAVY_MODULES) | set(_lazy_modules)):
+        try:
+            lazy_import(name)._load()
+        except ImportError:
+            continue
+        loaded.append(name)
+    return loaded
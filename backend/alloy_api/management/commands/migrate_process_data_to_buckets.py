@@ -0,0 +1,81 @@
+
+from itertools import groupby
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+from alloy_api.models import ProcessData
+from alloy_api import timeseries
+
+class Command(BaseCommand):
+    help = 'Copy process_data documents into the bucketed time-series layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Readings to read from process_data per batch')
+        parser.add_argument('--clear', action='store_true',
+                            help='Drop existing buckets before migrating')
+        parser.add_argument('--delete-source', action='store_true',
+                            help='Delete the per-reading documents after a successful copy')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count buckets without writing anything')
+
+    def handle(self, *args, **options):
+        alias = router.db_for_write(ProcessData)
+        buckets = timeseries.bucket_collection(for_write=True)
+
+        if not options['dry_run']:
+            if options['clear']:
+                buckets.delete_many({})
+            elif buckets.estimated_document_count():
+                raise CommandError(f'{timeseries.BUCKET_COLLECTION} is not empty; rerun with --clear to rebuild it')
+
+        # Snapshot the newest id so readings arriving during the copy are
+        # neither half-copied nor deleted by --delete-source
+        max_id = ProcessData.objects.order_by('-id').values_list('id', flat=True).first()
+        if max_id is None:
+            self.stdout.write('process_data is empty; nothing to migrate.')
+            return
+        source = ProcessData.objects.filter(id__lte=max_id)
+        readings = source.order_by('furnace_id', 'timestamp').iterator(
+            chunk_size=options['batch_size']
+        )
+        total_readings = 0
+        total_buckets = 0
+        pending = []
+
+        def slice_key(reading):
+            return reading.furnace_id, timeseries.bucket_start_for(reading.timestamp)
+
+        for _, group in groupby(readings, key=slice_key):
+            group = [{
+                'furnace_id': r.furnace_id,
+                'timestamp': r.timestamp,
+                'temperature': r.temperature,
+                'pressure': r.pressure,
+                'oxygen_level': r.oxygen_level,
+                'quality_score': r.quality_score,
+                'composition_data': r.composition_data or {},
+            } for r in group]
+            count = -(-len(group) // timeseries.BUCKET_CAPACITY)
+            first_id = 0 if options['dry_run'] else timeseries.allocate_bucket_ids(count, using=alias)
+            pending.extend(timeseries.build_bucket_documents(group, first_id))
+            total_readings += len(group)
+
+            if sum(doc['count'] for doc in pending) >= options['batch_size']:
+                total_buckets += self._flush(buckets, pending, options['dry_run'])
+                pending = []
+
+        total_buckets += self._flush(buckets, pending, options['dry_run'])
+
+        if options['delete_source'] and not options['dry_run']:
+            source.delete()
+
+        verb = 'Would migrate' if options['dry_run'] else 'Migrated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {total_readings} readings into {total_buckets} buckets. '
+            'Set PROCESS_DATA_STORAGE=buckets to serve them; reading ids change.'
+        ))
+
+    def _flush(self, buckets, documents, dry_run):
+        if documents and not dry_run:
+            buckets.insert_many(documents, ordered=False)
+        return len(documents)
@@ -2,6 +2,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from alloy_api.models import AlloyComposition, ProcessData, Inventory, Alert
+from alloy_api import timeseries
 import random
 
 class Command(BaseCommand):
@@ -40,8 +41,11 @@ class Command(BaseCommand):
         
         # Create sample process data
         furnace_ids = ['F001', 'F002', 'F003']
+        # With bucketed storage readings live in process_data_buckets, not process_data
+        create_reading = (timeseries.append_reading if timeseries.bucketed_storage()
+                          else lambda reading: ProcessData.objects.create(**reading))
         for _ in range(50):
-            ProcessData.objects.create(
+            create_reading(dict(
                 furnace_id=random.choice(furnace_ids),
                 temperature=random.uniform(1450, 1650),
                 pressure=random.uniform(0.8, 1.2),
@@ -53,7 +57,7 @@ class Command(BaseCommand):
                     'Mo': random.uniform(1.5, 2.5)
                 },
                 quality_score=random.uniform(85, 98)
-            )
+            ))
         
         # Create sample inventory
         materials = [
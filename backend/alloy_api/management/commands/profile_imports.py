@@ -0,0 +1,94 @@
+
+import json
+import os
+import pkgutil
+import subprocess
+import sys
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from alloy_api.lazy import HEAVY_MODULES
+
+# pandas and scikit-learn are installed but unused; report them too so an
+# accidental eager import shows up
+WATCHED_MODULES = HEAVY_MODULES + ['pandas', 'sklearn']
+
+# Runs in a fresh interpreter so every module is measured from a cold start,
+# after django.setup() has loaded models and admin like a worker would.
+PROBE = """
+import importlib, json, sys, time
+import django
+django.setup()
+from alloy_api.management.commands.profile_imports import current_rss_mb
+before = current_rss_mb()
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'module': sys.argv[1],
+    'import_ms': round(elapsed * 1000, 2),
+    'rss_mb': round(current_rss_mb(), 2),
+    'rss_delta_mb': round(current_rss_mb() - before, 2),
+    'heavy_modules': [m for m in sys.argv[2].split(',') if m in sys.modules],
+}))
+"""
+
+def current_rss_mb():
+    """Resident memory of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        # Peak rather than current RSS; kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class Command(BaseCommand):
+    help = 'Report cold import time and resident memory for each app module'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', action='append', dest='apps',
+                            help='App label to profile (repeatable, default: alloy_api)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--max-import-ms', type=float,
+                            help='Fail if any module takes longer than this to import')
+        parser.add_argument('--max-rss-mb', type=float,
+                            help='Fail if any module leaves the process above this RSS')
+
+    def handle(self, *args, **options):
+        modules = []
+        for label in options['apps'] or ['alloy_api']:
+            app_config = apps.get_app_config(label)
+            modules.append(app_config.name)
+            for info in pkgutil.walk_packages([app_config.path], prefix=f'{app_config.name}.'):
+                modules.append(info.name)
+
+        env = dict(os.environ, WARM_HEAVY_IMPORTS='False')
+        report = []
+        for module in modules:
+            result = subprocess.run(
+                [sys.executable, '-c', PROBE, module, ','.join(WATCHED_MODULES)],
+                capture_output=True, text=True, env=env
+            )
+            if result.returncode != 0:
+                self.stderr.write(f'{module}: import failed\n{result.stderr.strip()}')
+                continue
+            report.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"{'module':<55} {'import ms':>10} {'rss MB':>8} {'+MB':>7}  heavy")
+            for row in sorted(report, key=lambda r: r['import_ms'], reverse=True):
+                self.stdout.write(
+                    f"{row['module']:<55} {row['import_ms']:>10.1f} {row['rss_mb']:>8.1f} "
+                    f"{row['rss_delta_mb']:>7.1f}  {','.join(row['heavy_modules']) or '-'}"
+                )
+
+        failures = []
+        if options['max_import_ms'] is not None:
+            failures += [r['module'] for r in report if r['import_ms'] > options['max_import_ms']]
+        if options['max_rss_mb'] is not None:
+            failures += [r['module'] for r in report if r['rss_mb'] > options['max_rss_mb']]
+        if failures:
+            raise CommandError(f"Import budget exceeded by: {', '.join(sorted(set(failures)))}")
@@ -0,0 +1,281 @@
+
+import ipaddress
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import urlparse
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from alloy_api.db_routers import analytics_reads
+from alloy_api.timeseries import fetch_readings
+
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+def percentile(values, q):
+    """Nearest-rank percentile of an unsorted list; None when empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50),
+        'p99': percentile(values, 99),
+        'max': round(max(values), 2) if values else None,
+    }
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+class Command(BaseCommand):
+    help = 'Replay recorded or synthetic process data through the ingestion API and measure lag'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000/api',
+                            help='API root of a local backend (loopback hosts only)')
+        parser.add_argument('--source', choices=['synthetic', 'recorded'], default='synthetic',
+                            help='Generate readings or replay process_data from the database')
+        parser.add_argument('--furnaces', type=int, default=10, help='Number of furnaces to replay')
+        parser.add_argument('--rate', type=float, default=1.0,
+                            help='Synthetic readings per second per furnace (plant time)')
+        parser.add_argument('--duration', type=float, default=60.0,
+                            help='Synthetic seconds of plant time to generate')
+        parser.add_argument('--hours', type=float, default=1.0,
+                            help='Recorded hours of process_data to replay')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Replay speed multiple; 10 sends ten seconds of data per second')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent ingestion requests')
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help='Seconds between `recent` polls used to measure lag')
+        parser.add_argument('--drain-timeout', type=float, default=30.0,
+                            help='Seconds to keep polling for readings not yet visible')
+        parser.add_argument('--furnace-prefix', default='REPLAY-',
+                            help='Prefix for replayed furnace ids so they can be told apart')
+        parser.add_argument('--label', default='', help='Build label stored in the report')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Earlier JSON report to compare against')
+        parser.add_argument('--seed', type=int, help='Seed for synthetic readings')
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self._check_local(self.base_url)
+        if options['speed'] <= 0:
+            raise CommandError('--speed must be positive')
+
+        schedule = self._build_schedule(options)
+        if not schedule:
+            raise CommandError('Nothing to replay')
+        self.stdout.write(
+            f"Replaying {len(schedule)} readings for {len({item['reading']['furnace_id'] for item in schedule})} furnaces "
+            f"at {options['speed']}x against {self.base_url}"
+        )
+
+        self.lock = threading.Lock()
+        self.pending = {}  # (furnace_id, timestamp) -> time the reading was sent
+        self.lags_ms = []
+        self.post_ms = []
+        self.statuses = {}
+        self.slips_ms = []
+        self.poll_ms = []
+
+        stop_polling = threading.Event()
+        poller = threading.Thread(target=self._poll, args=(options['poll_interval'], stop_polling), daemon=True)
+        poller.start()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for item in schedule:
+                due = started + item['offset'] / options['speed']
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._send, item['reading'], due)
+        send_seconds = time.perf_counter() - started
+
+        deadline = time.perf_counter() + options['drain_timeout']
+        while time.perf_counter() < deadline:
+            with self.lock:
+                if not self.pending:
+                    break
+            time.sleep(options['poll_interval'])
+        stop_polling.set()
+        poller.join()
+
+        report = self._report(options, schedule, send_seconds)
+        self._print(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+        if options['compare']:
+            with open(options['compare']) as f:
+                self._print_comparison(json.load(f), report)
+
+    def _check_local(self, url):
+        host = urlparse(url).hostname or ''
+        if host in LOCAL_HOSTS:
+            return
+        try:
+            if ipaddress.ip_address(host).is_loopback:
+                return
+        except ValueError:
+            pass
+        raise CommandError(f'Refusing to replay against non-local host {host!r}')
+
+    def _build_schedule(self, options):
+        """List of {'offset': plant seconds from start, 'reading': payload} sorted by offset"""
+        prefix = options['furnace_prefix']
+        schedule = []
+        if options['source'] == 'synthetic':
+            rng = random.Random(options['seed'])
+            interval = 1 / options['rate']
+            for furnace in range(options['furnaces']):
+                offset = rng.uniform(0, interval)
+                while offset < options['duration']:
+                    schedule.append({'offset': offset, 'reading': {
+                        'furnace_id': f'{prefix}F{furnace + 1:03d}',
+                        'temperature': rng.uniform(1450, 1650),
+                        'pressure': rng.uniform(0.8, 1.2),
+                        'oxygen_level': rng.uniform(0.01, 0.05),
+                        'composition_data': {
+                            'Fe': rng.uniform(65, 75),
+                            'Cr': rng.uniform(16, 20),
+                            'Ni': rng.uniform(8, 12),
+                            'Mo': rng.uniform(1.5, 2.5)
+                        },
+                    }})
+                    offset += interval
+        else:
+            with analytics_reads():
+                readings = sorted(
+                    fetch_readings(since=timezone.now() - timedelta(hours=options['hours'])),
+                    key=lambda r: r.timestamp
+                )
+            furnaces = sorted({r.furnace_id for r in readings})[:options['furnaces']]
+            readings = [r for r in readings if r.furnace_id in furnaces]
+            if readings:
+                origin = readings[0].timestamp
+                for r in readings:
+                    schedule.append({'offset': (r.timestamp - origin).total_seconds(), 'reading': {
+                        'furnace_id': f'{prefix}{r.furnace_id}',
+                        'temperature': r.temperature,
+                        'pressure': r.pressure,
+                        'oxygen_level': r.oxygen_level,
+                        'composition_data': r.composition_data or {},
+                        'quality_score': r.quality_score,
+                    }})
+        schedule.sort(key=lambda item: item['offset'])
+        return schedule
+
+    def _send(self, reading, due):
+        # Readings are stamped when sent, as a live sensor would; Mongo keeps
+        # milliseconds, so drop the rest to match what `recent` returns
+        sent_at = datetime.now(dt_timezone.utc)
+        sent_at = sent_at.replace(microsecond=sent_at.microsecond // 1000 * 1000)
+        payload = dict(reading, timestamp=sent_at.isoformat())
+        request = urllib.request.Request(
+            f'{self.base_url}/process-data/', data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json', 'X-Furnace-ID': reading['furnace_id']},
+            method='POST'
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 'error'
+        post_ms = (time.perf_counter() - started) * 1000
+        slip_ms = max(0.0, (started - due) * 1000)
+
+        with self.lock:
+            self.slips_ms.append(slip_ms)
+            self.post_ms.append(post_ms)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            if status in (201, 202):
+                self.pending[(reading['furnace_id'], sent_at)] = sent_at
+
+    def _poll(self, interval, stop):
+        """Watch `recent` and record when each accepted reading becomes visible"""
+        while not stop.is_set():
+            with self.lock:
+                oldest = min(self.pending.values(), default=None)
+            if oldest is None:
+                stop.wait(interval)
+                continue
+            # Ask only for the minutes since the oldest reading still awaited
+            age = (datetime.now(dt_timezone.utc) - oldest).total_seconds()
+            url = f'{self.base_url}/process-data/recent/?minutes={math.ceil(age / 60) + 1}'
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    rows = json.loads(response.read())
+                seen_at = datetime.now(dt_timezone.utc)
+                visible = {(row['furnace_id'], parse_timestamp(row['timestamp'])) for row in rows}
+                with self.lock:
+                    for key in [k for k in self.pending if k in visible]:
+                        self.lags_ms.append((seen_at - self.pending.pop(key)).total_seconds() * 1000)
+            except (urllib.error.URLError, OSError, ValueError, KeyError):
+                pass
+            # The poll loads the API too; its duration also bounds lag resolution
+            with self.lock:
+                self.poll_ms.append((time.perf_counter() - started) * 1000)
+            stop.wait(interval)
+
+    def _report(self, options, schedule, send_seconds):
+        accepted = sum(n for status, n in self.statuses.items() if status in ('201', '202'))
+        plant_seconds = max(item['offset'] for item in schedule) or 1.0
+        return {
+            'label': options['label'],
+            'generated_at': timezone.now().isoformat(),
+            'config': {
+                key: options[key] for key in (
+                    'base_url', 'source', 'furnaces', 'rate', 'duration', 'hours',
+                    'speed', 'concurrency', 'poll_interval'
+                )
+            },
+            'readings_sent': len(schedule),
+            'offered_per_second': round(len(schedule) / (plant_seconds / options['speed']), 2),
+            'achieved_per_second': round(accepted / send_seconds, 2) if send_seconds else None,
+            'statuses': self.statuses,
+            'post_latency_ms': summarize(self.post_ms),
+            'schedule_slip_ms': summarize(self.slips_ms),
+            'lag_ms': summarize(self.lags_ms),
+            'poll_ms': summarize(self.poll_ms),
+            'not_visible': len(self.pending),
+        }
+
+    def _print(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f"sent {report['readings_sent']}  offered {report['offered_per_second']}/s  "
+            f"achieved {report['achieved_per_second']}/s  statuses {report['statuses']}"
+        ))
+        for key in ('post_latency_ms', 'schedule_slip_ms', 'lag_ms', 'poll_ms'):
+            stats = report[key]
+            self.stdout.write(f"{key:<18} p50={stats['p50']}  p99={stats['p99']}  max={stats['max']}  n={stats['count']}")
+        if report['not_visible']:
+            self.stdout.write(self.style.WARNING(f"{report['not_visible']} accepted readings never appeared in `recent`"))
+
+    def _print_comparison(self, baseline, report):
+        self.stdout.write(f"Compared with {baseline.get('label') or 'baseline'}:")
+        rows = [('achieved_per_second', None)] + [
+            (key, stat) for key in ('post_latency_ms', 'lag_ms') for stat in ('p50', 'p99')
+        ]
+        for key, stat in rows:
+            before = baseline.get(key) if stat is None else (baseline.get(key) or {}).get(stat)
+            after = report.get(key) if stat is None else report[key].get(stat)
+            name = key if stat is None else f'{key}.{stat}'
+            if before is None or after is None:
+                self.stdout.write(f'  {name:<24} {before} -> {after}')
+            else:
+                self.stdout.write(f'  {name:<24} {before} -> {after} ({after - before:+.2f})')
@@ -61,9 +61,23 @@ class Alert(models.Model):
     is_resolved = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
     resolved_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True)
 
     class Meta:
         db_table = 'alerts'
 
     def __str__(self):
         return f"{self.title} - {self.severity}"
+
+class Tombstone(models.Model):
+    """Marker left behind when a synced record is deleted"""
+    collection = models.CharField(max_length=50)  # db_table of the deleted record
+    object_id = models.CharField(max_length=50)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'tombstones'
+        indexes = [models.Index(fields=['collection', 'deleted_at'])]
+
+    def __str__(self):
+        return f"{self.collection}:{self.object_id} deleted {self.deleted_at}"
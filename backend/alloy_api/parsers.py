@@ -0,0 +1,29 @@
+import sys
+from array import array
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from .renderers import FLOAT64_ARRAY_EXT
+
+def decode_ext(code, data):
+    if code == FLOAT64_ARRAY_EXT:
+        values = array('d')
+        values.frombytes(data)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values.tolist()
+    return msgpack.ExtType(code, data)
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack request bodies (Content-Type: application/msgpack)"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, ext_hook=decode_ext)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise ParseError(f'MessagePack parse error - {str(e)}')
+
+class LegacyMessagePackParser(MessagePackParser):
+    """Same parser for clients still sending application/x-msgpack"""
+    media_type = 'application/x-msgpack'
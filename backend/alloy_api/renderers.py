@@ -0,0 +1,46 @@
+import datetime
+import decimal
+import uuid
+import msgpack
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+# ExtType code for a little-endian float64 array, packed straight from the
+# array buffer; clients can read the payload as a Float64Array
+FLOAT64_ARRAY_EXT = 1
+
+def encode_default(obj):
+    """msgpack fallback for the types DRF's JSON encoder also handles"""
+    if isinstance(obj, datetime.datetime):
+        representation = obj.isoformat()
+        if representation.endswith('+00:00'):
+            representation = representation[:-6] + 'Z'
+        return representation
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (uuid.UUID, Promise)):
+        return str(obj)
+    if hasattr(obj, 'dtype') and hasattr(obj, 'tobytes'):
+        # NumPy values, recognised without importing NumPy
+        if obj.ndim == 1 and obj.dtype.kind == 'f':
+            return msgpack.ExtType(FLOAT64_ARRAY_EXT, obj.astype('<f8', copy=False).tobytes())
+        return obj.tolist() if obj.ndim else obj.item()
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not MessagePack serializable')
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders responses as MessagePack (Accept: application/msgpack or ?format=msgpack)"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
@@ -0,0 +1,125 @@
+import time
+from typing import Dict, List, Optional
+from .lazy import lazy_import
+from .utils import AlloyOptimizer, QualityAnalyzer
+
+np = lazy_import('numpy')
+
+DEFAULT_TRIALS = 20000
+MAX_TRIALS = 200000
+DEFAULT_HEAT_MASS_KG = 1000.0
+DEFAULT_MEASUREMENT_STD = 0.05  # wt%, one sigma of the spectrometer reading
+DEFAULT_RECOVERY = {'mean': 0.95, 'std': 0.02}
+
+class WhatIfSimulator:
+    """Monte Carlo what-if for alloy additions to a heat.
+
+    Each trial samples the measured composition within its uncertainty and
+    the recovery of every addition, mixes them into the heat and scores the
+    result with QualityAnalyzer. Trials are evaluated as one NumPy batch.
+    """
+
+    def __init__(self, target_grade: str, heat_mass_kg: float = DEFAULT_HEAT_MASS_KG,
+                 trials: int = DEFAULT_TRIALS, seed: Optional[int] = None):
+        if target_grade not in QualityAnalyzer.GRADE_SPECS:
+            raise ValueError(f'Unknown grade: {target_grade}')
+        if heat_mass_kg <= 0:
+            raise ValueError('heat_mass_kg must be positive')
+        if not 0 < trials <= MAX_TRIALS:
+            raise ValueError(f'trials must be between 1 and {MAX_TRIALS}')
+        self.target_grade = target_grade
+        self.heat_mass_kg = float(heat_mass_kg)
+        self.trials = int(trials)
+        self.rng = np.random.default_rng(seed)
+
+    def run(self, current_composition: Dict[str, float], additions: List[Dict],
+            measurement_std=DEFAULT_MEASUREMENT_STD, off_spec_cost: float = 0.0) -> Dict:
+        """Simulate `additions` on a heat measured at `current_composition`.
+
+        `additions` items look like ``{'material': 'FeCr 65%', 'quantity': 15.2}``
+        with optional ``recovery`` ({'mean', 'std'}) and ``unit_cost``.
+        `measurement_std` is a scalar or a per-element dict (wt%).
+        """
+        started = time.perf_counter()
+        for addition in additions:
+            if addition.get('material') not in AlloyOptimizer.ALLOY_MATERIALS:
+                raise ValueError(f"Unknown material: {addition.get('material')}")
+            if float(addition.get('quantity', 0)) < 0:
+                raise ValueError('Addition quantities must not be negative')
+
+        # Only elements that were measured or are added get scored, as in
+        # QualityAnalyzer.calculate_quality_score on the resulting composition
+        elements = sorted(
+            set(current_composition)
+            | {e for a in additions for e in AlloyOptimizer.ALLOY_MATERIALS[a['material']]}
+        )
+        measured = self._sample_composition(current_composition, elements, measurement_std)
+        final = self._mix(measured, additions, elements)
+        scores, in_spec = QualityAnalyzer.calculate_quality_scores(final, elements, self.target_grade)
+        _, baseline_in_spec = QualityAnalyzer.calculate_quality_scores(
+            measured, elements, self.target_grade, present=list(current_composition)
+        )
+
+        addition_cost = sum(
+            float(a['quantity']) * float(a.get('unit_cost', AlloyOptimizer.DEFAULT_MATERIAL_COST))
+            for a in additions
+        )
+        probability = float(in_spec.mean())
+        return {
+            'target_grade': self.target_grade,
+            'trials': self.trials,
+            'heat_mass_kg': self.heat_mass_kg,
+            'probability_in_spec': round(probability, 4),
+            'baseline_probability_in_spec': round(float(baseline_in_spec.mean()), 4),
+            'expected_quality_score': round(float(scores.mean()), 2),
+            'quality_score_p5': round(float(np.percentile(scores, 5)), 2),
+            'addition_cost': round(addition_cost, 2),
+            'expected_cost': round(addition_cost + (1 - probability) * off_spec_cost, 2),
+            'final_composition': {
+                element: {
+                    'mean': round(float(final[:, i].mean()), 4),
+                    'p5': round(float(np.percentile(final[:, i], 5)), 4),
+                    'p95': round(float(np.percentile(final[:, i], 95)), 4),
+                }
+                for i, element in enumerate(elements)
+            },
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def _sample_composition(self, composition, elements, measurement_std):
+        """Draw (trials, elements) measured compositions in wt%"""
+        mean = np.array([float(composition.get(e, 0.0)) for e in elements])
+        if isinstance(measurement_std, dict):
+            std = np.array([float(measurement_std.get(e, DEFAULT_MEASUREMENT_STD)) for e in elements])
+        else:
+            std = np.full(len(elements), float(measurement_std))
+        # Elements absent from the reading stay at zero rather than going negative
+        std = np.where(mean > 0, std, 0.0)
+        return np.clip(self.rng.normal(mean, std, size=(self.trials, len(elements))), 0, None)
+
+    def _mix(self, measured, additions, elements):
+        """Final compositions after adding each material at its sampled recovery"""
+        if not additions:
+            return measured
+
+        quantity = np.array([float(a['quantity']) for a in additions])
+        fractions = np.array([
+            [AlloyOptimizer.ALLOY_MATERIALS[a['material']].get(e, 0.0) / 100 for e in elements]
+            for a in additions
+        ])
+        recovery_mean = np.array([float(a.get('recovery', DEFAULT_RECOVERY).get('mean', DEFAULT_RECOVERY['mean']))
+                                  for a in additions])
+        recovery_std = np.array([float(a.get('recovery', DEFAULT_RECOVERY).get('std', DEFAULT_RECOVERY['std']))
+                                 for a in additions])
+        recovery = np.clip(self.rng.normal(recovery_mean, recovery_std, size=(self.trials, len(additions))), 0, 1)
+
+        # Unrecovered material goes to slag, so only recovered mass joins the heat
+        recovered = recovery * quantity  # (trials, additions) kg
+        element_mass = self.heat_mass_kg * measured / 100 + recovered @ fractions
+        total_mass = self.heat_mass_kg + recovered.sum(axis=1)
+        return 100 * element_mass / total_mass[:, None]
+
+def target_midpoints(target_grade: str) -> Dict[str, float]:
+    """Centre of each element range for a grade"""
+    spec = QualityAnalyzer.GRADE_SPECS[target_grade]
+    return {element: (low + high) / 2 for element, (low, high) in spec.items()}
@@ -0,0 +1,124 @@
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import Tombstone
+
+# Tokens are issued slightly in the past so writes that were in flight while a
+# feed was read are sent again next time; clients upsert by id.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+def encode_sync_token(moment):
+    """Encode a watermark as an opaque, URL-safe token (epoch microseconds)"""
+    return str(int(moment.timestamp() * 1_000_000))
+
+def decode_sync_token(token):
+    """Decode a token from encode_sync_token; raises ValueError if malformed
+    and OverflowError/OSError if out of range"""
+    return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+
+def record_tombstone(sender, instance, **kwargs):
+    """post_delete receiver for models served through DeltaSyncMixin"""
+    Tombstone.objects.create(collection=sender._meta.db_table, object_id=str(instance.pk))
+
+class DeltaSyncMixin:
+    """Changes feed and conditional GET for a ModelViewSet.
+
+    ``sync_field`` names the model's auto-updated timestamp. List and detail
+    responses carry ETag/Last-Modified and return 304 before serializing when
+    the client's copy is current.
+    """
+    sync_field = 'updated_at'
+
+    def get_collection(self):
+        return self.queryset.model._meta.db_table
+
+    def latest_tombstone(self):
+        return (Tombstone.objects.filter(collection=self.get_collection())
+                .order_by('-deleted_at').values_list('deleted_at', flat=True).first())
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        since = request.query_params.get('since')
+        try:
+            since_time = decode_sync_token(since) if since else None
+        except (TypeError, ValueError, OverflowError, OSError):
+            return Response({'error': 'Invalid since token'}, status=status.HTTP_400_BAD_REQUEST)
+
+        token = encode_sync_token(timezone.now() - SYNC_OVERLAP)
+        changed = self.filter_queryset(self.get_queryset())
+        deleted = []
+        if since_time:
+            changed = changed.filter(**{f'{self.sync_field}__gt': since_time})
+            # Tombstones keep ids as text; hand them back typed like the rows in `changed`
+            pk_field = self.queryset.model._meta.pk
+            deleted = [pk_field.to_python(object_id) for object_id in Tombstone.objects.filter(
+                collection=self.get_collection(), deleted_at__gt=since_time
+            ).values_list('object_id', flat=True)]
+
+        serializer = self.get_serializer(changed, many=True)
+        return Response({
+            'token': token,
+            'full_sync': since_time is None,
+            'changed': serializer.data,
+            'deleted': deleted,
+        })
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        latest = (queryset.order_by(f'-{self.sync_field}')
+                  .values_list(self.sync_field, flat=True).first())
+        deleted = self.latest_tombstone()
+        last_modified = max([t for t in (latest, deleted) if t], default=None)
+        etag = self._make_etag(
+            request.get_full_path(), request.accepted_media_type, queryset.count(), latest, deleted
+        )
+
+        not_modified = self._not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        return self._set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = getattr(instance, self.sync_field)
+        etag = self._make_etag(self.get_collection(), request.accepted_media_type, instance.pk, last_modified)
+
+        not_modified = self._not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = Response(self.get_serializer(instance).data)
+        return self._set_validators(response, etag, last_modified)
+
+    @staticmethod
+    def _make_etag(*parts):
+        return hashlib.md5('|'.join(str(p) for p in parts).encode()).hexdigest()
+
+    def _not_modified(self, request, etag, last_modified):
+        response = get_conditional_response(
+            request, etag=quote_etag(etag), last_modified=self._timestamp(last_modified)
+        )
+        if response is not None:
+            self._set_validators(response, etag, last_modified)
+        return response
+
+    def _set_validators(self, response, etag, last_modified):
+        # The same URL can be rendered as JSON or MessagePack
+        patch_vary_headers(response, ['Accept'])
+        response['ETag'] = quote_etag(etag)
+        if last_modified:
+            response['Last-Modified'] = http_date(self._timestamp(last_modified))
+        return response
+
+    @staticmethod
+    def _timestamp(moment):
+        if not moment:
+            return None
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, dt_timezone.utc)
+        return int(moment.timestamp())
@@ -0,0 +1,51 @@
+import logging
+import time
+from celery import shared_task
+from django.conf import settings
+from .db_routers import analytics_reads
+from .drift import detect_drift
+from .models import Alert
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def detect_composition_drift(target_grade=None, lookback_minutes=None, window=None):
+    """Score every furnace's latest compositions and raise alerts for drift"""
+    target_grade = target_grade or settings.DRIFT_TARGET_GRADE
+    lookback_minutes = lookback_minutes or settings.DRIFT_LOOKBACK_MINUTES
+    window = window or settings.DRIFT_WINDOW
+
+    started = time.perf_counter()
+    try:
+        with analytics_reads():
+            _, results = detect_drift(target_grade, lookback_minutes, window)
+    except ValueError as e:
+        # No reference yet (e.g. a new grade); nothing to compare against
+        logger.warning(f'Skipping composition drift check: {str(e)}')
+        return {'target_grade': target_grade, 'skipped': str(e)}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    alerts_created = 0
+    for result in results:
+        if not result['drifting']:
+            continue
+        title = f"Composition Drift ({target_grade})"
+        if Alert.objects.filter(title=title, source=result['furnace_id'], is_resolved=False).exists():
+            continue
+        elements = ', '.join(c['element'] for c in result['top_contributors'])
+        Alert.objects.create(
+            title=title,
+            message=(f"Furnace {result['furnace_id']} composition drifting from {target_grade} "
+                     f"(T²={result['t2']:.1f}, limit {result['threshold']:.1f}); main contributors: {elements}"),
+            severity=result['severity'],
+            source=result['furnace_id'],
+        )
+        alerts_created += 1
+
+    return {
+        'target_grade': target_grade,
+        'furnaces_scored': len(results),
+        'drifting': [r['furnace_id'] for r in results if r['drifting']],
+        'alerts_created': alerts_created,
+        'elapsed_ms': round(elapsed_ms, 2),
+    }
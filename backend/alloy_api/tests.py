@@ -0,0 +1,464 @@
+import json
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from . import drift, throttling, timeseries
+from .db_routers import AnalyticsRouter, analytics_reads, use_analytics_db
+from .drift import CompositionDriftDetector
+from .ingest_buffer import WriteBehindBuffer
+from .models import Alert, Tombstone
+from .sync import encode_sync_token
+from .throttling import TokenBucket, TokenBucketThrottle, parse_rate
+from .utils import QualityAnalyzer
+
+def make_redis():
+    """fakeredis with Lua support if installed, otherwise a local Redis; None when neither is available"""
+    try:
+        import fakeredis
+        client = fakeredis.FakeStrictRedis()
+        client.eval('return 1', 0)
+        return client
+    except Exception:
+        pass
+    try:
+        import redis
+        client = redis.Redis.from_url('redis://localhost:6379/15', socket_connect_timeout=0.2)
+        client.ping()
+        return client
+    except Exception:
+        return None
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.client = make_redis()
+        if self.client is None:
+            self.skipTest('needs fakeredis[lua] or a local Redis')
+        self.client.delete('test:bucket')
+        # 2 tokens per second, burst of 4
+        self.bucket = TokenBucket(self.client, rate=2.0, capacity=4)
+
+    def tearDown(self):
+        if self.client is not None:
+            self.client.delete('test:bucket')
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('20/s'), (20.0, 20))
+        self.assertEqual(parse_rate('300/min'), (5.0, 300))
+
+    def test_burst_up_to_capacity_then_reject(self):
+        for _ in range(4):
+            allowed, wait = self.bucket.consume('test:bucket', now=1000.0)
+            self.assertTrue(allowed)
+            self.assertEqual(wait, 0)
+        allowed, wait = self.bucket.consume('test:bucket', now=1000.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 0.5)
+
+    def test_refill_over_time(self):
+        for _ in range(4):
+            self.bucket.consume('test:bucket', now=1000.0)
+        self.assertFalse(self.bucket.consume('test:bucket', now=1000.25)[0])
+        # 0.5 s at 2 tokens/s refills one token (the rejected check took none)
+        self.assertTrue(self.bucket.consume('test:bucket', now=1000.5)[0])
+        self.assertFalse(self.bucket.consume('test:bucket', now=1000.5)[0])
+
+    def test_refill_is_capped_at_capacity(self):
+        self.bucket.consume('test:bucket', now=1000.0)
+        allowed = [self.bucket.consume('test:bucket', now=2000.0)[0] for _ in range(5)]
+        self.assertEqual(allowed, [True, True, True, True, False])
+
+    def test_wait_reflects_cost(self):
+        for _ in range(4):
+            self.bucket.consume('test:bucket', now=1000.0)
+        allowed, wait = self.bucket.consume('test:bucket', cost=3, now=1000.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.5)
+
+class IngestTestThrottle(TokenBucketThrottle):
+    scope = 'ingest'
+    cache_prefix = 'test-throttle'
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'ingest': '2/min'}})
+class TokenBucketThrottleTests(SimpleTestCase):
+    key = 'test-throttle:ingest:furnace:F1'
+
+    def setUp(self):
+        self.client = make_redis()
+        if self.client is None:
+            self.skipTest('needs fakeredis[lua] or a local Redis')
+        self.client.delete(self.key)
+        patches = [
+            mock.patch.object(throttling, 'get_redis', return_value=self.client),
+            mock.patch.object(throttling, '_buckets', {}),
+            mock.patch.object(throttling, '_redis_down_until', 0.0),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        if self.client is not None:
+            self.client.delete(self.key)
+
+    def post(self, body):
+        request = APIRequestFactory().post('/api/process-data/', body, content_type='application/json')
+        return Request(request, parsers=[JSONParser()])
+
+    def reading(self):
+        return self.post(json.dumps({'furnace_id': 'F1', 'temperature': 1500}))
+
+    def test_limits_per_furnace(self):
+        throttle = IngestTestThrottle()
+        self.assertTrue(throttle.allow_request(self.reading(), None))
+        self.assertTrue(throttle.allow_request(self.reading(), None))
+        self.assertFalse(throttle.allow_request(self.reading(), None))
+        self.assertGreater(throttle.wait(), 0)
+
+    def test_malformed_body_raises_parse_error_and_keeps_throttling(self):
+        throttle = IngestTestThrottle()
+        throttle.allow_request(self.reading(), None)
+        throttle.allow_request(self.reading(), None)
+        with self.assertRaises(ParseError):
+            throttle.allow_request(self.post(b'{bad json'), None)
+        self.assertEqual(throttling._redis_down_until, 0.0)
+        self.assertFalse(throttle.allow_request(self.reading(), None))
+
+    def test_redis_errors_fail_open(self):
+        with mock.patch.object(throttling, 'get_bucket', side_effect=RedisConnectionError('down')):
+            self.assertTrue(IngestTestThrottle().allow_request(self.reading(), None))
+        self.assertGreater(throttling._redis_down_until, 0.0)
+
+class QualityScoreTests(SimpleTestCase):
+    def test_vectorized_scores_match_scalar(self):
+        compositions = [
+            {'Fe': 70, 'Cr': 15, 'Ni': 9},
+            {'Fe': 68.5, 'Cr': 17.2, 'Ni': 10.1, 'Mo': 2.1, 'Mn': 1.8, 'Si': 0.3},
+            {'Fe': 75, 'Cr': 21, 'Ni': 7, 'C': 0.5},
+            {'C': 0.05},
+        ]
+        elements = ['C', 'Cr', 'Fe', 'Mn', 'Mo', 'Ni', 'Si']
+        for grade in ('316L', '304', 'unknown'):
+            for composition in compositions:
+                row = [[composition.get(e, 0.0) for e in elements]]
+                scores, _ = QualityAnalyzer.calculate_quality_scores(
+                    row, elements, grade, present=list(composition)
+                )
+                self.assertAlmostEqual(
+                    scores[0], QualityAnalyzer.calculate_quality_score(composition, grade)
+                )
+
+class WriteBehindBufferTests(SimpleTestCase):
+    def make_buffer(self, failures):
+        written = []
+
+        def writer(batch):
+            if failures:
+                failures.pop()
+                raise ConnectionError('mongo unavailable')
+            written.extend(batch)
+
+        buffer = WriteBehindBuffer(capacity=10, flush_rows=5, flush_interval_ms=10,
+                                   max_retries=2, writer=writer)
+        return buffer, written
+
+    def test_failed_batch_is_retried(self):
+        buffer, written = self.make_buffer(failures=[1, 1])
+        for i in range(3):
+            self.assertTrue(buffer.offer({'n': i}))
+        buffer.stop()
+        self.assertEqual([r['n'] for r in written], [0, 1, 2])
+        metrics = buffer.metrics()
+        self.assertEqual(metrics['failed_flushes'], 2)
+        self.assertEqual(metrics['dead_letter_rows'], 0)
+
+    def test_rows_left_after_stop_timeout_are_dead_lettered(self):
+        buffer, written = self.make_buffer(failures=[1] * 100)
+        buffer.flush_interval = 0.2
+        for i in range(8):
+            buffer.offer({'n': i})
+        buffer.stop(timeout=0.05)
+        metrics = buffer.metrics()
+        self.assertEqual(written, [])
+        self.assertEqual(metrics['depth'], 0)
+        self.assertGreaterEqual(metrics['dead_letter_rows'], 3)
+
+    def test_batch_is_dead_lettered_after_max_retries(self):
+        buffer, written = self.make_buffer(failures=[1, 1, 1])
+        buffer.offer({'n': 0})
+        buffer.stop()
+        self.assertEqual(written, [])
+        self.assertEqual(buffer.metrics()['dead_letter_rows'], 1)
+        self.assertEqual(buffer.metrics()['depth'], 0)
+
+class CompositionDriftTests(SimpleTestCase):
+    def history(self, n, rng):
+        return [{'Fe': rng.uniform(65, 72), 'Cr': rng.uniform(16, 18),
+                 'Ni': rng.uniform(10, 14), 'Mo': rng.uniform(2, 3)} for _ in range(n)]
+
+    def test_reference_is_fitted_on_measured_in_spec_elements(self):
+        rng = random.Random(1)
+        history = self.history(300, rng) + [{'Fe': 80, 'Cr': 10, 'Ni': 5, 'Mo': 1}] * 50
+        detector = CompositionDriftDetector.from_history('316L', history)
+        self.assertEqual(detector.elements, ['Cr', 'Fe', 'Mo', 'Ni'])
+        self.assertAlmostEqual(detector.mean[0], 17.0, delta=0.2)
+
+    def test_flags_shift_but_not_typical_heats(self):
+        rng = random.Random(2)
+        detector = CompositionDriftDetector.from_history('316L', self.history(500, rng))
+        typical = detector.score(['F1'], [detector.mean])[0]
+        shifted = detector.score(['F2'], [detector.mean + [-0.9, 0, -0.4, -1.8]], counts=[5])[0]
+        self.assertFalse(typical['drifting'])
+        self.assertTrue(shifted['drifting'])
+
+    @override_settings(DRIFT_REFERENCE_PER_FURNACE=200, DRIFT_REFERENCE_HOURS=168, DRIFT_REFERENCE_TTL_MINUTES=60)
+    def test_reference_is_fitted_once_per_ttl(self):
+        rng = random.Random(4)
+        history = [mock.Mock(composition_data=c) for c in self.history(300, rng)]
+        with mock.patch.object(drift, '_references', {}), \
+                mock.patch.object(drift, 'latest_readings', return_value=history) as fetch:
+            first = drift.get_reference('316L', 60)
+            self.assertIs(drift.get_reference('316L', 60), first)
+            self.assertEqual(fetch.call_count, 1)
+            with mock.patch.object(drift.time, 'monotonic', return_value=drift.time.monotonic() + 3601):
+                self.assertIsNot(drift.get_reference('316L', 60), first)
+            self.assertEqual(fetch.call_count, 2)
+
+    def test_needs_enough_history(self):
+        with self.assertRaises(ValueError):
+            CompositionDriftDetector.from_history('316L', self.history(5, random.Random(3)))
+
+class FakeCursor:
+    def __init__(self, collection, docs):
+        self.collection = collection
+        self.docs = docs
+
+    def sort(self, key, direction):
+        return FakeCursor(self.collection, sorted(self.docs, key=lambda d: d[key], reverse=direction < 0))
+
+    def __iter__(self):
+        for doc in self.docs:
+            self.collection.read.append(doc['_id'])
+            yield doc
+
+class FakeBuckets:
+    """Just enough of a pymongo collection for the bucket code paths under test"""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.read = []
+        self.operations = []
+
+    def aggregate(self, pipeline):
+        # BucketReadingList's live-count pipeline
+        ordered = sorted(self.docs, key=lambda d: (d['bucket_start'], d['_id']))
+        return [{'_id': d['_id'], 'live': d['count'] - len(d['deleted'])} for d in ordered]
+
+    def find(self, query, projection=None):
+        ids = query.get('_id', {}).get('$in')
+        return FakeCursor(self, [d for d in self.docs if ids is None or d['_id'] in ids])
+
+    def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+
+def make_reading(furnace_id, moment, temperature=1500.0):
+    return {'furnace_id': furnace_id, 'timestamp': moment, 'temperature': temperature,
+            'pressure': 1.0, 'oxygen_level': 0.02, 'composition_data': {'Fe': 70.0}}
+
+def make_bucket(bucket_id, furnace_id, start, count, deleted=()):
+    readings = [make_reading(furnace_id, start + timedelta(minutes=slot)) for slot in range(count)]
+    for reading in readings:
+        reading['quality_score'] = None
+    document = timeseries.build_bucket_documents(readings, bucket_id)[0]
+    document['deleted'] = list(deleted)
+    return document
+
+@override_settings(PROCESS_DATA_BUCKET_SECONDS=3600)
+class BucketStorageTests(SimpleTestCase):
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def use_buckets(self, collection):
+        patch = mock.patch.object(timeseries, 'bucket_collection', return_value=collection)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_reading_ids_round_trip(self):
+        pk = timeseries.reading_id(17, 3)
+        self.assertEqual(pk, 17 * timeseries.BUCKET_CAPACITY + 3)
+        self.assertEqual(timeseries.split_reading_id(pk), (17, 3))
+        self.assertEqual(timeseries.split_reading_id(str(pk)), (17, 3))
+
+    def test_build_bucket_documents_splits_at_capacity(self):
+        readings = [dict(make_reading('F1', self.start + timedelta(seconds=i), temperature=i), quality_score=None)
+                    for i in range(timeseries.BUCKET_CAPACITY + 6)]
+        documents = timeseries.build_bucket_documents(readings, first_id=40)
+        self.assertEqual([d['_id'] for d in documents], [40, 41])
+        self.assertEqual([d['count'] for d in documents], [timeseries.BUCKET_CAPACITY, 6])
+        self.assertEqual(documents[0]['bucket_start'], self.start)
+        self.assertEqual(documents[0]['bucket_end'], self.start + timedelta(hours=1))
+        self.assertEqual(documents[1]['stats']['temperature'],
+                         {'min': timeseries.BUCKET_CAPACITY, 'max': timeseries.BUCKET_CAPACITY + 5})
+
+    def test_append_readings_upserts_one_group_per_furnace_and_slice(self):
+        collection = FakeBuckets()
+        self.use_buckets(collection)
+        readings = [make_reading(furnace_id, self.start + timedelta(minutes=40 * i), temperature=i)
+                    for i in range(3) for furnace_id in ('F2', 'F1')]
+        with mock.patch.object(timeseries, 'allocate_bucket_ids', return_value=100), \
+                mock.patch.object(timeseries, 'UpdateOne', side_effect=lambda query, update, upsert: (query, update)):
+            timeseries.append_readings(readings)
+
+        groups = [(q['furnace_id'], q['bucket_start'], u['$inc']['count'], u['$setOnInsert']['_id'])
+                  for q, u in collection.operations]
+        self.assertEqual(groups, [
+            ('F1', self.start, 2, 100),
+            ('F1', self.start + timedelta(hours=1), 1, 101),
+            ('F2', self.start, 2, 102),
+            ('F2', self.start + timedelta(hours=1), 1, 103),
+        ])
+        query, update = collection.operations[0]
+        self.assertEqual(query['count'], {'$lte': timeseries.BUCKET_CAPACITY - 2})
+        self.assertEqual(update['$push']['temperature'], {'$each': [0, 1]})
+        self.assertEqual(update['$max']['stats.temperature.max'], 1)
+
+    def test_reading_list_pages_skip_deleted_and_empty_buckets(self):
+        self.use_buckets(FakeBuckets([
+            make_bucket(0, 'F1', self.start, 3, deleted=[1]),
+            make_bucket(1, 'F2', self.start, 1, deleted=[0]),
+            make_bucket(2, 'F1', self.start + timedelta(hours=1), 5, deleted=[0, 4]),
+            make_bucket(3, 'F1', self.start + timedelta(hours=2), 2),
+        ]))
+        readings = timeseries.BucketReadingList()
+        expected = [0, 2, 2049, 2050, 2051, 3072, 3073]
+        self.assertEqual(readings.count(), len(expected))
+        self.assertEqual([r.id for r in readings], expected)
+        for start in range(len(expected) + 1):
+            for stop in range(start, len(expected) + 2):
+                self.assertEqual([r.id for r in readings[start:stop]], expected[start:stop])
+        self.assertEqual(readings[3].id, 2050)
+
+    def test_query_readings_stops_after_the_slice_that_fills_the_limit(self):
+        collection = FakeBuckets([
+            make_bucket(0, 'F1', self.start, 3),
+            make_bucket(1, 'F2', self.start + timedelta(hours=1), 3),
+            make_bucket(2, 'F1', self.start + timedelta(hours=2), 1),
+            make_bucket(3, 'F2', self.start + timedelta(hours=2), 2),
+        ])
+        self.use_buckets(collection)
+        readings = timeseries.query_readings(newest_first=True, limit=2)
+        self.assertEqual([r.timestamp for r in readings],
+                         [self.start + timedelta(hours=2, minutes=1), self.start + timedelta(hours=2)])
+        # The cursor hands over the first bucket of the next slice, nothing older
+        self.assertEqual(sorted(collection.read), [1, 2, 3])
+
+    def test_update_reading_rejects_furnace_change(self):
+        current = timeseries._reading_from(make_bucket(5, 'F1', self.start, 1), 0, timeseries.reading_id(5, 0))
+        collection = FakeBuckets()
+        self.use_buckets(collection)
+        with mock.patch.object(timeseries, 'get_reading', return_value=current):
+            with self.assertRaises(ValueError):
+                timeseries.update_reading(current.id, {'furnace_id': 'F2', 'temperature': 1600.0})
+
+@mock.patch.object(TokenBucketThrottle, 'allow_request', return_value=True)
+class DeltaSyncTests(TestCase):
+    def make_alert(self, title):
+        return Alert.objects.create(title=title, message='m', severity='low', source='F001')
+
+    def test_list_returns_304_until_alerts_change(self, _):
+        self.make_alert('A')
+        url = reverse('alert-list')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.make_alert('B')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_detail_returns_304_for_current_validators(self, _):
+        alert = self.make_alert('A')
+        Alert.objects.filter(pk=alert.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        url = reverse('alert-detail', args=[alert.pk])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        alert.refresh_from_db()
+        alert.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_deleting_leaves_a_tombstone(self, _):
+        alert = self.make_alert('A')
+        pk = alert.pk
+        alert.delete()
+        self.assertTrue(Tombstone.objects.filter(collection='alerts', object_id=str(pk)).exists())
+
+    def test_changes_since_token(self, _):
+        old = self.make_alert('old')
+        Alert.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        gone = self.make_alert('gone')
+        since = encode_sync_token(timezone.now() - timedelta(minutes=30))
+        new = self.make_alert('new')
+        gone_pk = gone.pk
+        gone.delete()
+
+        full = self.client.get(reverse('alert-changes')).json()
+        self.assertTrue(full['full_sync'])
+        self.assertEqual(sorted(row['id'] for row in full['changed']), sorted([old.pk, new.pk]))
+        self.assertEqual(full['deleted'], [])
+
+        delta = self.client.get(reverse('alert-changes'), {'since': since}).json()
+        self.assertFalse(delta['full_sync'])
+        self.assertEqual([row['id'] for row in delta['changed']], [new.pk])
+        # Same id type as the rows in `changed`
+        self.assertEqual(delta['deleted'], [gone_pk])
+
+    def test_invalid_since_is_rejected(self, _):
+        for token in ('not-a-token', '99999999999999999999999'):
+            response = self.client.get(reverse('alert-changes'), {'since': token})
+            self.assertEqual(response.status_code, 400)
+
+TWO_DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    'analytics': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+@override_settings(DATABASES=TWO_DATABASES, ANALYTICS_DB_ALIAS='analytics')
+class AnalyticsRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = AnalyticsRouter()
+
+    def test_reads_use_analytics_only_when_opted_in(self):
+        self.assertIsNone(self.router.db_for_read(Alert))
+        with analytics_reads() as alias:
+            self.assertEqual(alias, 'analytics')
+            self.assertEqual(self.router.db_for_read(Alert), 'analytics')
+        self.assertIsNone(self.router.db_for_read(Alert))
+
+    def test_decorated_view_reads_from_analytics(self):
+        @use_analytics_db
+        def view():
+            return self.router.db_for_read(Alert)
+
+        self.assertEqual(view(), 'analytics')
+        self.assertIsNone(self.router.db_for_read(Alert))
+
+    def test_falls_back_to_default_without_the_alias(self):
+        with override_settings(DATABASES={'default': TWO_DATABASES['default']}):
+            with analytics_reads() as alias:
+                self.assertEqual(alias, 'default')
+                self.assertEqual(self.router.db_for_read(Alert), 'default')
+
+    def test_writes_always_go_to_default(self):
+        self.assertEqual(self.router.db_for_write(Alert), 'default')
+        with analytics_reads():
+            self.assertEqual(self.router.db_for_write(Alert), 'default')
@@ -0,0 +1,146 @@
+import logging
+import time
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+# Refill and consume in a single atomic round trip. The bucket is a hash of
+# {tokens, ts}; the caller's clock is used so the script stays deterministic.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+_redis_client = None
+
+def get_redis():
+    """Shared Redis connection for throttle buckets, created on first use"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        # Short timeouts: an unreachable Redis must not stall every request
+        _redis_client = redis.Redis.from_url(
+            settings.THROTTLE_REDIS_URL,
+            socket_connect_timeout=settings.THROTTLE_REDIS_TIMEOUT,
+            socket_timeout=settings.THROTTLE_REDIS_TIMEOUT,
+        )
+    return _redis_client
+
+def parse_rate(rate):
+    """Parse a DRF-style rate ('20/s', '300/min') into (tokens_per_second, capacity)"""
+    num, period = rate.split('/')
+    num_requests = int(num)
+    duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return num_requests / duration, num_requests
+
+class TokenBucket:
+    """Redis-backed token bucket; one EVALSHA per check"""
+
+    def __init__(self, client, rate, capacity):
+        self.client = client
+        self.rate = rate
+        self.capacity = capacity
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def consume(self, key, cost=1, now=None):
+        """Take `cost` tokens; returns (allowed, seconds_until_allowed)"""
+        now = time.time() if now is None else now
+        allowed, wait = self.script(keys=[key], args=[self.rate, self.capacity, now, cost])
+        return bool(int(allowed)), float(wait)
+
+_buckets = {}
+
+# After a Redis failure, skip throttling for this long instead of paying the
+# timeout on every request
+REDIS_RETRY_SECONDS = 5.0
+_redis_down_until = 0.0
+
+def get_bucket(rate):
+    """Return the process-wide bucket for a rate string"""
+    if rate not in _buckets:
+        _buckets[rate] = TokenBucket(get_redis(), *parse_rate(rate))
+    return _buckets[rate]
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token-bucket throttle keyed by furnace or API client.
+
+    The scope comes from the class, then ``view.throttle_scope``, then the
+    request method ('read' or 'write'). Rates use ``DEFAULT_THROTTLE_RATES``,
+    where '20/s' refills 20 tokens per second with a burst of 20.
+    """
+    scope = None
+    cache_prefix = 'throttle'
+
+    def get_scope(self, request, view):
+        scope = self.scope or getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_furnace_id(self, request):
+        furnace_id = request.headers.get('X-Furnace-ID')
+        if furnace_id:
+            return furnace_id
+        if request.method not in SAFE_METHODS and isinstance(request.data, dict):
+            return request.data.get('furnace_id')
+        return request.query_params.get('furnace_id')
+
+    def get_cache_key(self, request, view, scope):
+        if scope == 'ingest':
+            furnace_id = self.get_furnace_id(request)
+            if furnace_id:
+                return f'{self.cache_prefix}:{scope}:furnace:{furnace_id}'
+        if request.user and request.user.is_authenticated:
+            return f'{self.cache_prefix}:{scope}:user:{request.user.pk}'
+        return f'{self.cache_prefix}:{scope}:ident:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        global _redis_down_until
+        if time.monotonic() < _redis_down_until:
+            return True
+        # Outside the try: a malformed body must surface as a 400, not as a Redis outage
+        key = self.get_cache_key(request, view, scope)
+        try:
+            allowed, wait = get_bucket(rate).consume(key)
+        except (RedisError, OSError) as e:
+            # Never take ingestion down with the rate limiter
+            _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            logger.warning(f'Token bucket unavailable, allowing requests for {REDIS_RETRY_SECONDS}s: {str(e)}')
+            return True
+
+        if not allowed:
+            self.wait_seconds = wait
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+class AnalyticsThrottle(TokenBucketThrottle):
+    scope = 'analytics'
@@ -0,0 +1,412 @@
+import threading
+from itertools import groupby
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import connections, router
+from django.utils import timezone
+from pymongo import ReturnDocument, UpdateOne
+from .models import ProcessData
+
+# Bucketed layout for process_data: one document per furnace per time slice
+# holding parallel arrays, instead of one document per reading.
+#
+#   {_id: 17, furnace_id: 'F001', bucket_start, bucket_end, count: 3, deleted: [],
+#    timestamp: [...], temperature: [...], pressure: [...], oxygen_level: [...],
+#    quality_score: [...], composition_data: [{...}, ...],
+#    stats: {timestamp: {min, max}, temperature: {min, max}, ...}}
+#
+# Reading ids stay integers: bucket _id * BUCKET_CAPACITY + slot. Stats only
+# ever widen, so they remain safe bounds for pruning after updates and deletes.
+
+BUCKET_COLLECTION = 'process_data_buckets'
+COUNTER_COLLECTION = 'process_data_bucket_counters'
+BUCKET_CAPACITY = 1024
+ARRAY_FIELDS = ['timestamp', 'temperature', 'pressure', 'oxygen_level', 'quality_score', 'composition_data']
+STAT_FIELDS = ['timestamp', 'temperature', 'pressure', 'oxygen_level']
+
+_indexes_ready = set()
+_indexes_lock = threading.Lock()
+
+def bucketed_storage() -> bool:
+    """True when ProcessData is stored in time buckets"""
+    return getattr(settings, 'PROCESS_DATA_STORAGE', 'documents') == 'buckets'
+
+def bucket_width() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'PROCESS_DATA_BUCKET_SECONDS', 3600))
+
+def bucket_start_for(moment: datetime) -> datetime:
+    """Start of the time slice containing `moment`"""
+    seconds = int(bucket_width().total_seconds())
+    epoch = int(_aware(moment).timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+def reading_id(bucket_id: int, slot: int) -> int:
+    return bucket_id * BUCKET_CAPACITY + slot
+
+def split_reading_id(pk) -> tuple:
+    return divmod(int(pk), BUCKET_CAPACITY)
+
+def get_collection(name: str, using: str):
+    """Raw pymongo collection on a djongo connection"""
+    return connections[using].cursor().db_conn[name]
+
+def bucket_collection(for_write: bool = False):
+    alias = router.db_for_write(ProcessData) if for_write else router.db_for_read(ProcessData)
+    collection = get_collection(BUCKET_COLLECTION, alias)
+    # Indexes are built through the write alias only; read replicas inherit them
+    if for_write and alias not in _indexes_ready:
+        with _indexes_lock:
+            collection.create_index([('furnace_id', 1), ('bucket_start', 1)])
+            collection.create_index([('bucket_start', 1), ('_id', 1)])
+            _indexes_ready.add(alias)
+    return collection
+
+def allocate_bucket_ids(n: int = 1, using: Optional[str] = None) -> int:
+    """Reserve `n` consecutive bucket ids and return the first"""
+    counters = get_collection(COUNTER_COLLECTION, using or router.db_for_write(ProcessData))
+    doc = counters.find_one_and_update(
+        {'_id': BUCKET_COLLECTION}, {'$inc': {'seq': n}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc['seq'] - n + 1
+
+def append_reading(data: Dict) -> ProcessData:
+    """Store one validated reading in its furnace's current bucket"""
+    reading = _normalize(data)
+    start = bucket_start_for(reading['timestamp'])
+    collection = bucket_collection(for_write=True)
+
+    query = {'furnace_id': reading['furnace_id'], 'bucket_start': start, 'count': {'$lt': BUCKET_CAPACITY}}
+    update = {
+        '$push': {field: reading[field] for field in ARRAY_FIELDS},
+        '$inc': {'count': 1},
+        '$min': {f'stats.{field}.min': reading[field] for field in STAT_FIELDS},
+        '$max': {f'stats.{field}.max': reading[field] for field in STAT_FIELDS},
+    }
+    doc = collection.find_one_and_update(
+        query, update, projection={'count': 1}, return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        # Open a new bucket; only this path pays for an id allocation
+        update['$setOnInsert'] = {
+            '_id': allocate_bucket_ids(),
+            'bucket_end': start + bucket_width(),
+            'deleted': [],
+        }
+        doc = collection.find_one_and_update(
+            query, update, projection={'count': 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    return ProcessData(id=reading_id(doc['_id'], doc['count'] - 1), **reading)
+
+def append_readings(readings: List[Dict]):
+    """Store a batch of validated readings with one bulk_write.
+
+    Readings are grouped by furnace and time slice; each group becomes one
+    upsert that pushes onto an open bucket with room for the whole group, or
+    opens a bucket with a pre-allocated id. Ids are not returned.
+    """
+    readings = sorted(
+        (_normalize(data) for data in readings),
+        key=lambda r: (r['furnace_id'], r['timestamp'])
+    )
+    chunks = []
+    for (furnace_id, start), group in groupby(
+            readings, key=lambda r: (r['furnace_id'], bucket_start_for(r['timestamp']))):
+        group = list(group)
+        chunks.extend((furnace_id, start, group[i:i + BUCKET_CAPACITY])
+                      for i in range(0, len(group), BUCKET_CAPACITY))
+    if not chunks:
+        return
+
+    first_id = allocate_bucket_ids(len(chunks))
+    operations = []
+    for n, (furnace_id, start, chunk) in enumerate(chunks):
+        query = {'furnace_id': furnace_id, 'bucket_start': start,
+                 'count': {'$lte': BUCKET_CAPACITY - len(chunk)}}
+        update = {
+            '$push': {field: {'$each': [r[field] for r in chunk]} for field in ARRAY_FIELDS},
+            '$inc': {'count': len(chunk)},
+            '$min': {f'stats.{field}.min': min(r[field] for r in chunk) for field in STAT_FIELDS},
+            '$max': {f'stats.{field}.max': max(r[field] for r in chunk) for field in STAT_FIELDS},
+            '$setOnInsert': {'_id': first_id + n, 'bucket_end': start + bucket_width(), 'deleted': []},
+        }
+        operations.append(UpdateOne(query, update, upsert=True))
+    bucket_collection(for_write=True).bulk_write(operations, ordered=False)
+
+def get_reading(pk) -> Optional[ProcessData]:
+    bucket_id, slot = split_reading_id(pk)
+    projection = {field: {'$slice': [slot, 1]} for field in ARRAY_FIELDS}
+    projection.update({'furnace_id': 1, 'count': 1, 'deleted': 1})
+    doc = bucket_collection().find_one({'_id': bucket_id}, projection)
+    if doc is None or slot >= doc['count'] or slot in doc.get('deleted', []):
+        return None
+    return _reading_from(doc, 0, reading_id(bucket_id, slot))
+
+def update_reading(pk, data: Dict) -> Optional[ProcessData]:
+    """Overwrite fields of one reading in place"""
+    bucket_id, slot = split_reading_id(pk)
+    changes = {field: data[field] for field in ARRAY_FIELDS if field in data}
+    if 'timestamp' in changes:
+        changes['timestamp'] = _aware(changes['timestamp'])
+    if 'timestamp' in changes or 'furnace_id' in data:
+        # A bucket holds one furnace and one time slice, so neither can change in place
+        current = get_reading(pk)
+        if current and data.get('furnace_id', current.furnace_id) != current.furnace_id:
+            raise ValueError('Readings cannot be moved to another furnace')
+        if current and 'timestamp' in changes and \
+                bucket_start_for(changes['timestamp']) != bucket_start_for(current.timestamp):
+            raise ValueError('Readings cannot be moved to another time bucket')
+    if changes:
+        update = {'$set': {f'{field}.{slot}': value for field, value in changes.items()}}
+        stats = {field: changes[field] for field in STAT_FIELDS if field in changes}
+        if stats:
+            update['$min'] = {f'stats.{field}.min': value for field, value in stats.items()}
+            update['$max'] = {f'stats.{field}.max': value for field, value in stats.items()}
+        bucket_collection(for_write=True).update_one({'_id': bucket_id}, update)
+    return get_reading(pk)
+
+def delete_reading(pk):
+    bucket_id, slot = split_reading_id(pk)
+    bucket_collection(for_write=True).update_one({'_id': bucket_id}, {'$addToSet': {'deleted': slot}})
+
+def query_readings(since: Optional[datetime] = None, furnace_id: Optional[str] = None,
+                   newest_first: bool = False, limit: Optional[int] = None) -> List[ProcessData]:
+    """Readings matching the filters, ordered by timestamp"""
+    query = {}
+    if furnace_id:
+        query['furnace_id'] = furnace_id
+    if since:
+        since = _aware(since)
+        # bucket_start is indexed; the stats bound drops buckets that end early
+        query['bucket_start'] = {'$gt': since - bucket_width()}
+        query['stats.timestamp.max'] = {'$gte': since}
+
+    # Walk slices from the wanted end; with a limit, stop once a whole slice
+    # has been read after `limit` readings, as later slices cannot sort ahead
+    readings = []
+    slice_start = None
+    cursor = bucket_collection().find(query, {'stats': 0}).sort('bucket_start', -1 if newest_first else 1)
+    for doc in cursor:
+        if doc['bucket_start'] != slice_start:
+            if limit is not None and len(readings) >= limit:
+                break
+            slice_start = doc['bucket_start']
+        deleted = set(doc.get('deleted', []))
+        for slot in range(doc['count']):
+            if slot in deleted:
+                continue
+            reading = _reading_from(doc, slot, reading_id(doc['_id'], slot))
+            if since is None or reading.timestamp >= since:
+                readings.append(reading)
+
+    readings.sort(key=lambda r: r.timestamp, reverse=newest_first)
+    return readings[:limit] if limit is not None else readings
+
+class BucketReadingList:
+    """All readings in storage order, sliceable for DRF pagination.
+
+    Only per-bucket live counts are read to locate a page; the arrays of the
+    buckets that overlap it are then fetched, so a page costs one light
+    aggregation plus the buckets it touches rather than the whole history.
+    """
+    ORDER = [('bucket_start', 1), ('_id', 1)]
+
+    def __init__(self):
+        self._live = None
+
+    def live_counts(self) -> List[tuple]:
+        """[(bucket_id, readings not deleted)] in storage order"""
+        if self._live is None:
+            pipeline = [
+                {'$sort': dict(self.ORDER)},
+                {'$project': {'live': {'$subtract': ['$count', {'$size': {'$ifNull': ['$deleted', []]}}]}}},
+            ]
+            self._live = [(doc['_id'], doc['live']) for doc in bucket_collection().aggregate(pipeline)]
+        return self._live
+
+    def count(self) -> int:
+        return sum(live for _, live in self.live_counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[0:self.count()])
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(self.count())
+        # Pick the buckets overlapping [start, stop) and the live offset into the first one
+        wanted, offset, position = [], 0, 0
+        for bucket_id, live in self.live_counts():
+            if position + live > start and position < stop:
+                if not wanted:
+                    offset = start - position
+                wanted.append(bucket_id)
+            position += live
+            if position >= stop:
+                break
+        if not wanted:
+            return []
+
+        docs = {doc['_id']: doc for doc in bucket_collection().find({'_id': {'$in': wanted}}, {'stats': 0})}
+        readings = []
+        for bucket_id in wanted:
+            doc = docs.get(bucket_id)
+            if doc is None:
+                continue
+            deleted = set(doc.get('deleted', []))
+            for slot in range(doc['count']):
+                if slot not in deleted:
+                    readings.append(_reading_from(doc, slot, reading_id(bucket_id, slot)))
+        return readings[offset:offset + (stop - start)]
+
+def fetch_readings(since: Optional[datetime] = None, furnace_id: Optional[str] = None,
+                   newest_first: bool = False, limit: Optional[int] = None):
+    """ProcessData readings from whichever storage layout is active"""
+    if bucketed_storage():
+        return query_readings(since=since, furnace_id=furnace_id, newest_first=newest_first, limit=limit)
+    readings = ProcessData.objects.all()
+    if since:
+        readings = readings.filter(timestamp__gte=since)
+    if furnace_id:
+        readings = readings.filter(furnace_id=furnace_id)
+    if newest_first:
+        readings = readings.order_by('-timestamp')
+    if limit is not None:
+        readings = readings[:limit]
+    return readings
+
+def latest_readings(per_furnace: int, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None) -> List[ProcessData]:
+    """Each furnace's newest `per_furnace` readings with composition data in [since, until).
+
+    The per-furnace cut is made in Mongo with $topN, so only the returned
+    readings leave the server. Each furnace's readings come newest first.
+    """
+    bounds = {}
+    if since:
+        bounds['$gte'] = _aware(since)
+    if until:
+        bounds['$lt'] = _aware(until)
+    match = {'composition_data': {'$nin': [None, {}]}}
+    if bounds:
+        match['timestamp'] = bounds
+
+    if bucketed_storage():
+        collection = bucket_collection()
+        bucket_ids = _latest_bucket_ids(per_furnace, since, until)
+        if not bucket_ids:
+            return []
+        slot = {'$arrayElemAt': ['$rows', 0]}
+        pipeline = [
+            {'$match': {'_id': {'$in': bucket_ids}}},
+            {'$project': {
+                'furnace_id': 1,
+                'deleted': {'$ifNull': ['$deleted', []]},
+                'rows': {'$zip': {'inputs': [{'$range': [0, '$count']}, '$timestamp', '$composition_data']}},
+            }},
+            {'$unwind': '$rows'},
+            {'$project': {
+                'furnace_id': 1,
+                'deleted': 1,
+                'slot': slot,
+                'id': {'$add': [{'$multiply': ['$_id', BUCKET_CAPACITY]}, slot]},
+                'timestamp': {'$arrayElemAt': ['$rows', 1]},
+                'composition_data': {'$arrayElemAt': ['$rows', 2]},
+            }},
+            {'$match': dict(match, **{'$expr': {'$not': [{'$in': ['$slot', '$deleted']}]}})},
+        ]
+    else:
+        collection = get_collection(ProcessData._meta.db_table, router.db_for_read(ProcessData))
+        pipeline = [{'$match': match}]
+
+    pipeline.append({'$group': {'_id': '$furnace_id', 'latest': {'$topN': {
+        'n': per_furnace,
+        'sortBy': {'timestamp': -1},
+        'output': {'id': '$id', 'timestamp': '$timestamp', 'composition_data': '$composition_data'},
+    }}}})
+    return [
+        ProcessData(id=row['id'], furnace_id=group['_id'], timestamp=_aware(row['timestamp']),
+                    composition_data=row['composition_data'])
+        for group in collection.aggregate(pipeline)
+        for row in group['latest']
+    ]
+
+def _latest_bucket_ids(per_furnace: int, since: Optional[datetime], until: Optional[datetime]) -> List[int]:
+    """Newest buckets per furnace that together hold at least `per_furnace` readings in range"""
+    bounds = {}
+    if since:
+        bounds['$gt'] = _aware(since) - bucket_width()
+    if until:
+        bounds['$lt'] = _aware(until)
+    pipeline = [
+        {'$match': {'bucket_start': bounds} if bounds else {}},
+        {'$sort': {'furnace_id': 1, 'bucket_start': -1}},
+        {'$project': {
+            'furnace_id': 1, 'bucket_start': 1, 'bucket_end': 1,
+            'live': {'$subtract': ['$count', {'$size': {'$ifNull': ['$deleted', []]}}]},
+        }},
+    ]
+    selected, taken = [], {}
+    for doc in bucket_collection().aggregate(pipeline):
+        furnace_id = doc['furnace_id']
+        if taken.get(furnace_id, 0) >= per_furnace:
+            continue
+        selected.append(doc['_id'])
+        # Buckets straddling a bound may hold fewer readings in range, so they don't count
+        inside = ((since is None or _aware(doc['bucket_start']) >= _aware(since))
+                  and (until is None or _aware(doc['bucket_end']) <= _aware(until)))
+        taken[furnace_id] = taken.get(furnace_id, 0) + (doc['live'] if inside else 0)
+    return selected
+
+def build_bucket_documents(readings: List[Dict], first_id: int) -> List[Dict]:
+    """Pack readings of one furnace and time slice, sorted by time, into bucket documents"""
+    documents = []
+    for offset in range(0, len(readings), BUCKET_CAPACITY):
+        chunk = readings[offset:offset + BUCKET_CAPACITY]
+        start = bucket_start_for(chunk[0]['timestamp'])
+        document = {
+            '_id': first_id + len(documents),
+            'furnace_id': chunk[0]['furnace_id'],
+            'bucket_start': start,
+            'bucket_end': start + bucket_width(),
+            'count': len(chunk),
+            'deleted': [],
+            'stats': {},
+        }
+        for field in ARRAY_FIELDS:
+            document[field] = [r[field] for r in chunk]
+        for field in STAT_FIELDS:
+            document['stats'][field] = {'min': min(document[field]), 'max': max(document[field])}
+        documents.append(document)
+    return documents
+
+def _normalize(data: Dict) -> Dict:
+    return {
+        'furnace_id': data['furnace_id'],
+        'temperature': data['temperature'],
+        'pressure': data['pressure'],
+        'oxygen_level': data['oxygen_level'],
+        'composition_data': data.get('composition_data') or {},
+        'timestamp': _aware(data.get('timestamp') or timezone.now()),
+        'quality_score': data.get('quality_score'),
+    }
+
+def _reading_from(doc: Dict, index: int, pk: int) -> ProcessData:
+    return ProcessData(
+        id=pk,
+        furnace_id=doc['furnace_id'],
+        timestamp=_aware(doc['timestamp'][index]),
+        temperature=doc['temperature'][index],
+        pressure=doc['pressure'][index],
+        oxygen_level=doc['oxygen_level'][index],
+        quality_score=doc['quality_score'][index],
+        composition_data=doc['composition_data'][index],
+    )
+
+def _aware(moment: datetime) -> datetime:
+    # pymongo hands back naive UTC datetimes
+    return timezone.make_aware(moment, dt_timezone.utc) if timezone.is_naive(moment) else moment
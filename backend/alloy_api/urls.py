@@ -17,6 +17,8 @@ urlpatterns = [
     path('ai/recommendations/', advanced_views.generate_recommendations, name='ai_recommendations'),
     path('ai/quality-analysis/', advanced_views.quality_analysis, name='quality_analysis'),
     path('ai/optimize-process/', advanced_views.optimize_process, name='optimize_process'),
+    path('ai/what-if/', advanced_views.what_if, name='what_if'),
+    path('ai/composition-drift/', advanced_views.composition_drift, name='composition_drift'),
     path('ai/predictive-maintenance/', advanced_views.predictive_maintenance, name='predictive_maintenance'),
     path('dashboard/metrics/', advanced_views.dashboard_metrics, name='dashboard_metrics'),
 ]
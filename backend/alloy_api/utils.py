@@ -1,32 +1,37 @@
 
-import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
+from .lazy import lazy_import
 from .models import ProcessData, AlloyComposition
 
+np = lazy_import('numpy')
+
 class AlloyOptimizer:
     """Advanced alloy optimization algorithms"""
     
+    # Alloy addition materials and their compositions (wt%)
+    ALLOY_MATERIALS = {
+        'FeSi 75%': {'Si': 75.0, 'Fe': 25.0},
+        'FeCr 65%': {'Cr': 65.0, 'Fe': 35.0},
+        'Ni Metal': {'Ni': 99.5, 'Fe': 0.5},
+        'FeMo 60%': {'Mo': 60.0, 'Fe': 40.0},
+        'Mn Metal': {'Mn': 99.0, 'Fe': 1.0},
+        'SiMn 65/15': {'Mn': 65.0, 'Si': 15.0, 'Fe': 20.0}
+    }
+    
+    # Approximate cost per kg of any addition material
+    DEFAULT_MATERIAL_COST = 12.5
+    
     @staticmethod
     def calculate_alloy_recommendations(target_composition: Dict[str, float], 
                                       current_composition: Dict[str, float]) -> List[Dict]:
         """Calculate optimal alloy additions based on target vs current composition"""
         recommendations = []
         
-        # Define alloy addition materials and their compositions
-        alloy_materials = {
-            'FeSi 75%': {'Si': 75.0, 'Fe': 25.0},
-            'FeCr 65%': {'Cr': 65.0, 'Fe': 35.0},
-            'Ni Metal': {'Ni': 99.5, 'Fe': 0.5},
-            'FeMo 60%': {'Mo': 60.0, 'Fe': 40.0},
-            'Mn Metal': {'Mn': 99.0, 'Fe': 1.0},
-            'SiMn 65/15': {'Mn': 65.0, 'Si': 15.0, 'Fe': 20.0}
-        }
-        
         for element, target_value in target_composition.items():
             current_value = current_composition.get(element, 0.0)
             
             if abs(target_value - current_value) > 0.01:  # Significant deviation
-                for material, composition in alloy_materials.items():
+                for material, composition in AlloyOptimizer.ALLOY_MATERIALS.items():
                     if element in composition and composition[element] > 50:
                         # Calculate required addition
                         element_needed = target_value - current_value
@@ -47,26 +52,27 @@ class AlloyOptimizer:
 class QualityAnalyzer:
     """Quality control and analysis utilities"""
     
+    # Element ranges (wt%) per grade
+    GRADE_SPECS = {
+        '316L': {
+            'Fe': (65, 72), 'Cr': (16, 18), 'Ni': (10, 14),
+            'Mo': (2, 3), 'Mn': (0, 2), 'Si': (0, 1)
+        },
+        '304': {
+            'Fe': (66, 74), 'Cr': (18, 20), 'Ni': (8, 10.5),
+            'Mn': (0, 2), 'Si': (0, 1), 'C': (0, 0.08)
+        }
+    }
+    
     @staticmethod
     def calculate_quality_score(composition: Dict[str, float], 
                               target_grade: str) -> float:
         """Calculate quality score based on composition adherence to grade specifications"""
         
-        grade_specs = {
-            '316L': {
-                'Fe': (65, 72), 'Cr': (16, 18), 'Ni': (10, 14),
-                'Mo': (2, 3), 'Mn': (0, 2), 'Si': (0, 1)
-            },
-            '304': {
-                'Fe': (66, 74), 'Cr': (18, 20), 'Ni': (8, 10.5),
-                'Mn': (0, 2), 'Si': (0, 1), 'C': (0, 0.08)
-            }
-        }
-        
-        if target_grade not in grade_specs:
+        if target_grade not in QualityAnalyzer.GRADE_SPECS:
             return 85.0  # Default score for unknown grades
         
-        spec = grade_specs[target_grade]
+        spec = QualityAnalyzer.GRADE_SPECS[target_grade]
         total_score = 0
         elements_checked = 0
         
@@ -84,6 +90,35 @@ class QualityAnalyzer:
                 elements_checked += 1
         
         return total_score / elements_checked if elements_checked > 0 else 85.0
+    
+    @staticmethod
+    def calculate_quality_scores(compositions, elements: List[str], target_grade: str,
+                                 present: Optional[List[str]] = None):
+        """Vectorized calculate_quality_score for an (n, len(elements)) array of compositions.
+        
+        Like the scalar version, only spec elements present in the input are
+        scored; `present` limits that to a subset of `elements` (default: all).
+        Returns (scores, in_spec) arrays of length n; in_spec requires every
+        checked element to be within its range.
+        """
+        compositions = np.asarray(compositions, dtype=float)
+        n = compositions.shape[0]
+        spec = QualityAnalyzer.GRADE_SPECS.get(target_grade)
+        present = set(elements if present is None else present)
+        checked = [i for i, element in enumerate(elements)
+                   if spec and element in spec and element in present]
+        if not checked:
+            return np.full(n, 85.0), np.ones(n, dtype=bool)
+        
+        values = compositions[:, checked]
+        low = np.array([spec[elements[i]][0] for i in checked], dtype=float)
+        high = np.array([spec[elements[i]][1] for i in checked], dtype=float)
+        center = (low + high) / 2
+        
+        within = (values >= low) & (values <= high)
+        penalty = np.minimum(50, np.abs(values - center) / center * 100)
+        element_scores = np.where(within, 100.0, np.maximum(50, 100 - penalty))
+        return element_scores.mean(axis=1), within.all(axis=1)
 
 class ProcessMonitor:
     """Real-time process monitoring utilities"""
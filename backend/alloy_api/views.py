@@ -1,12 +1,20 @@
 
+from contextlib import nullcontext
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import Http404
 from django.utils import timezone
+from . import timeseries
+from .ingest_buffer import buffered_ingest, get_buffer
+from .db_routers import analytics_reads
 from .models import AlloyComposition, ProcessData, Inventory, Alert
 from .serializers import AlloyCompositionSerializer, ProcessDataSerializer, InventorySerializer, AlertSerializer
+from .sync import DeltaSyncMixin
 
-class AlloyCompositionViewSet(viewsets.ModelViewSet):
+class AlloyCompositionViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = AlloyComposition.objects.all()
     serializer_class = AlloyCompositionSerializer
 
@@ -23,26 +31,102 @@ class ProcessDataViewSet(viewsets.ModelViewSet):
     queryset = ProcessData.objects.all()
     serializer_class = ProcessDataSerializer
 
+    @property
+    def throttle_scope(self):
+        # Sensor ingestion gets its own per-furnace budget
+        return 'ingest' if self.action == 'create' else None
+
+    # With PROCESS_DATA_STORAGE = 'buckets' readings live in time buckets
+    # (see timeseries.py); the API contract stays the same.
+
+    def get_queryset(self):
+        if timeseries.bucketed_storage():
+            # Paged at the bucket level; only the buckets for the page are decoded
+            return timeseries.BucketReadingList()
+        return super().get_queryset()
+
+    def get_object(self):
+        if not timeseries.bucketed_storage():
+            return super().get_object()
+        try:
+            reading = timeseries.get_reading(self.kwargs['pk'])
+        except ValueError:
+            reading = None
+        if reading is None:
+            raise Http404('No ProcessData matches the given query.')
+        self.check_object_permissions(self.request, reading)
+        return reading
+
+    def create(self, request, *args, **kwargs):
+        if not buffered_ingest() or isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        # Write-behind: validate now, persist with the next batch flush
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ingest_buffer = get_buffer()
+        if not ingest_buffer.offer(dict(serializer.validated_data)):
+            return Response(
+                {'error': 'Ingestion buffer full, retry shortly'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': '1'}
+            )
+        return Response({'status': 'accepted'}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'])
+    def ingest_metrics(self, request):
+        if not buffered_ingest():
+            return Response({'mode': 'sync'})
+        return Response({'mode': 'buffered', **get_buffer().metrics()})
+
+    def perform_create(self, serializer):
+        if timeseries.bucketed_storage():
+            serializer.instance = timeseries.append_reading(serializer.validated_data)
+        else:
+            serializer.save()
+
+    def perform_update(self, serializer):
+        if not timeseries.bucketed_storage():
+            serializer.save()
+            return
+        try:
+            serializer.instance = timeseries.update_reading(serializer.instance.pk, serializer.validated_data)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    def perform_destroy(self, instance):
+        if timeseries.bucketed_storage():
+            timeseries.delete_reading(instance.pk)
+        else:
+            instance.delete()
+
     @action(detail=False, methods=['get'])
     def recent(self, request):
-        hours = int(request.query_params.get('hours', 24))
-        cutoff_time = timezone.now() - timezone.timedelta(hours=hours)
-        recent_data = self.queryset.filter(timestamp__gte=cutoff_time)
-        serializer = self.get_serializer(recent_data, many=True)
-        return Response(serializer.data)
+        minutes = request.query_params.get('minutes')
+        if minutes is not None:
+            window = timezone.timedelta(minutes=int(minutes))
+        else:
+            window = timezone.timedelta(hours=int(request.query_params.get('hours', 24)))
+        cutoff_time = timezone.now() - window
+        # Long windows are analytical scans; keep them off the ingestion primary
+        long_window = window > timezone.timedelta(hours=settings.ANALYTICS_RECENT_HOURS_THRESHOLD)
+        with analytics_reads() if long_window else nullcontext():
+            recent_data = timeseries.fetch_readings(since=cutoff_time)
+            serializer = self.get_serializer(recent_data, many=True)
+            return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def by_furnace(self, request):
         furnace_id = request.query_params.get('furnace_id')
         if furnace_id:
-            data = self.queryset.filter(furnace_id=furnace_id)
+            data = timeseries.fetch_readings(furnace_id=furnace_id)
             serializer = self.get_serializer(data, many=True)
             return Response(serializer.data)
         return Response({'error': 'Furnace ID required'}, status=status.HTTP_400_BAD_REQUEST)
 
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = Inventory.objects.all()
     serializer_class = InventorySerializer
+    sync_field = 'last_updated'
 
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
@@ -51,7 +135,7 @@ class InventoryViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(low_stock_items, many=True)
         return Response(serializer.data)
 
-class AlertViewSet(viewsets.ModelViewSet):
+class AlertViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = Alert.objects.all()
     serializer_class = AlertSerializer
 
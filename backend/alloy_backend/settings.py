@@ -69,6 +69,42 @@ DATABASES = {
     }
 }
 
+# Optional analytics connection (e.g. a secondary member or a replica).
+# Views and commands opt in via alloy_api.db_routers; without
+# ANALYTICS_MONGO_URI their reads fall back to 'default'.
+ANALYTICS_DB_ALIAS = 'analytics'
+if os.getenv('ANALYTICS_MONGO_URI'):
+    DATABASES[ANALYTICS_DB_ALIAS] = {
+        'ENGINE': 'djongo',
+        'NAME': os.getenv('ANALYTICS_MONGO_DB_NAME', DATABASES['default']['NAME']),
+        'CLIENT': {
+            'host': os.getenv('ANALYTICS_MONGO_URI'),
+            'authSource': 'admin',
+            'readPreference': os.getenv('ANALYTICS_READ_PREFERENCE', 'secondaryPreferred'),
+        }
+    }
+
+DATABASE_ROUTERS = ['alloy_api.db_routers.AnalyticsRouter']
+
+# ProcessData layout: 'documents' (one document per reading) or 'buckets'
+# (one document per furnace per PROCESS_DATA_BUCKET_SECONDS, see
+# alloy_api/timeseries.py). Switch after running migrate_process_data_to_buckets.
+PROCESS_DATA_STORAGE = os.getenv('PROCESS_DATA_STORAGE', 'documents')
+PROCESS_DATA_BUCKET_SECONDS = int(os.getenv('PROCESS_DATA_BUCKET_SECONDS', 3600))
+
+# Single-reading POSTs to /api/process-data/: 'sync' writes each one, 'buffered'
+# answers 202 and writes in batches of INGEST_FLUSH_ROWS or every
+# INGEST_FLUSH_INTERVAL_MS, returning 429 once INGEST_BUFFER_CAPACITY are queued.
+PROCESS_DATA_INGEST_MODE = os.getenv('PROCESS_DATA_INGEST_MODE', 'sync')
+INGEST_BUFFER_CAPACITY = int(os.getenv('INGEST_BUFFER_CAPACITY', 10000))
+INGEST_FLUSH_ROWS = int(os.getenv('INGEST_FLUSH_ROWS', 500))
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv('INGEST_FLUSH_INTERVAL_MS', 200))
+# Retries of a failed batch before its readings are dropped (dead_letter_rows)
+INGEST_FLUSH_RETRIES = int(os.getenv('INGEST_FLUSH_RETRIES', 3))
+
+# `recent` windows longer than this many hours read through the analytics alias
+ANALYTICS_RECENT_HOURS_THRESHOLD = int(os.getenv('ANALYTICS_RECENT_HOURS_THRESHOLD', 24))
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -87,19 +123,33 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
+        'alloy_api.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'alloy_api.parsers.MessagePackParser',
+        'alloy_api.parsers.LegacyMessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'alloy_api.throttling.TokenBucketThrottle',
     ],
+    # Token buckets: '20/s' refills 20 tokens per second with a burst of 20.
+    # 'ingest' is per furnace, the others per API client.
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour'
+        'ingest': '20/s',
+        'read': '300/min',
+        'write': '60/min',
+        'analytics': '30/min',
     }
 }
 
+THROTTLE_REDIS_URL = os.getenv('THROTTLE_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+THROTTLE_REDIS_TIMEOUT = float(os.getenv('THROTTLE_REDIS_TIMEOUT', 0.1))  # seconds
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -107,6 +157,27 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    'detect-composition-drift': {
+        'task': 'alloy_api.tasks.detect_composition_drift',
+        'schedule': float(os.getenv('DRIFT_INTERVAL_SECONDS', 60)),
+    },
+}
+
+# Multivariate composition drift (alloy_api/drift.py): the mean of each
+# furnace's last DRIFT_WINDOW readings within DRIFT_LOOKBACK_MINUTES is
+# scored against a DRIFT_TARGET_GRADE reference fitted on in-spec readings
+# (up to DRIFT_REFERENCE_PER_FURNACE per furnace) from the preceding
+# DRIFT_REFERENCE_HOURS, refitted every DRIFT_REFERENCE_TTL_MINUTES.
+DRIFT_TARGET_GRADE = os.getenv('DRIFT_TARGET_GRADE', '316L')
+DRIFT_LOOKBACK_MINUTES = int(os.getenv('DRIFT_LOOKBACK_MINUTES', 60))
+DRIFT_WINDOW = int(os.getenv('DRIFT_WINDOW', 5))
+DRIFT_REFERENCE_HOURS = int(os.getenv('DRIFT_REFERENCE_HOURS', 168))
+DRIFT_REFERENCE_PER_FURNACE = int(os.getenv('DRIFT_REFERENCE_PER_FURNACE', 200))
+DRIFT_REFERENCE_TTL_MINUTES = int(os.getenv('DRIFT_REFERENCE_TTL_MINUTES', 60))
+
+# Import numpy (alloy_api.lazy.HEAVY_MODULES) at worker boot instead of on first use
+WARM_HEAVY_IMPORTS = os.getenv('WARM_HEAVY_IMPORTS', 'False').lower() in ('1', 'true', 'yes')
 
 # Logging Configuration
 LOGGING = {